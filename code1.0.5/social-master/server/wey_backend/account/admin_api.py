@@ -1,7 +1,9 @@
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import make_password
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 from django.db.models.functions import TruncDate
 from datetime import datetime, timedelta
 import nanoid
@@ -11,6 +13,7 @@ from rest_framework.permissions import IsAdminUser, BasePermission
 
 from .models import User, FriendshipRequest, MibtTestResult
 from .serializers import UserSerializer
+from .utils import invalidate_friend_ids
 from post.models import Post
 
 
@@ -43,12 +46,14 @@ def admin_users_list(request):
         is_staff = is_staff.lower() == 'true'
         users = users.filter(is_staff=is_staff)
     
+    users = list(users.prefetch_related('mibt_results'))
     serializer = UserSerializer(users, many=True)
     
     # 为每个用户添加创建时间
+    date_joined = {str(user.id): user.date_joined for user in users}
     user_data = serializer.data
     for user in user_data:
-        user['created_at'] = User.objects.get(id=user['id']).date_joined
+        user['created_at'] = date_joined[user['id']]
     
     return JsonResponse({
         'users': user_data
@@ -153,7 +158,7 @@ def admin_update_user(request, user_id):
     if 'password' in data and data['password']:
         user.password = make_password(data['password'])
     
-    user.save()
+    user.save(update_fields=['email', 'name', 'bio', 'is_active', 'is_admin', 'password'])
     
     serializer = UserSerializer(user)
     
@@ -168,9 +173,15 @@ def admin_update_user(request, user_id):
 def admin_delete_user(request, user_id):
     """删除用户，仅限管理员访问"""
     user = get_object_or_404(User, id=user_id)
+    friend_ids = list(user.friends.values_list('id', flat=True))
     
-    # 物理删除用户
-    user.delete()
+    # 物理删除用户，同时扣减其好友的好友数
+    with transaction.atomic():
+        user.delete()
+        User.objects.filter(pk__in=friend_ids).update(friends_count=Greatest(F('friends_count') - 1, 0))
+
+    # 被删除用户的好友需要重新加载好友列表
+    invalidate_friend_ids(user_id, *friend_ids)
     
     return JsonResponse({
         'success': True,
@@ -190,7 +201,7 @@ def admin_user_statistics(request):
     admin_users = User.objects.filter(is_admin=True).count()
     
     # 获取最近注册的用户
-    recent_users = User.objects.all().order_by('-date_joined')[:10]
+    recent_users = User.objects.all().order_by('-date_joined').prefetch_related('mibt_results')[:10]
     recent_users_serializer = UserSerializer(recent_users, many=True)
     
     # 按天统计新用户注册数
@@ -250,7 +261,7 @@ def admin_toggle_admin_status(request, user_id):
     # 切换管理员状态
     is_admin = data.get('is_admin', not user.is_admin)
     user.is_admin = is_admin
-    user.save()
+    user.save(update_fields=['is_admin'])
     
     serializer = UserSerializer(user)
     
@@ -272,7 +283,7 @@ def admin_reset_user_password(request, user_id):
     
     # 更新用户密码
     user.password = make_password(new_password)
-    user.save()
+    user.save(update_fields=['password'])
     
     return JsonResponse({
         'success': True,
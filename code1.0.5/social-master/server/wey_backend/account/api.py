@@ -3,7 +3,9 @@ from django.contrib.auth.forms import PasswordChangeForm
 from django.core.mail import send_mail
 from django.http import JsonResponse
 from django.contrib.auth import authenticate
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 import json
 import random
 import string
@@ -16,10 +18,13 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 
 from notification.utils import create_notification
+from post.timeline import backfill_friendship, prune_friendship
+from wey_backend.uploads import limit_uploads
 
 from .forms import SignupForm, ProfileForm
 from .models import User, FriendshipRequest, MibtTestResult
-from .serializers import UserSerializer, FriendshipRequestSerializer, MibtTestResultSerializer
+from .serializers import UserSerializer, FriendshipRequestSerializer, MibtTestResultSerializer, requested_fields
+from .utils import invalidate_friend_ids
 
 
 @api_view(['GET'])
@@ -177,29 +182,39 @@ def signup(request):
 def friends(request, pk):
     user = User.objects.get(pk=pk)
     requests = []
+    # 同一个响应中的用户卡片共用一个上下文，避免重复渲染
+    context = {'request': request, 'fields': requested_fields(request)}
 
     if user == request.user:
-        requests = FriendshipRequest.objects.filter(created_for=request.user, status=FriendshipRequest.SENT)
-        requests = FriendshipRequestSerializer(requests, many=True)
+        requests = FriendshipRequest.objects.filter(
+            created_for=request.user,
+            status=FriendshipRequest.SENT
+        ).prefetch_related('created_by__mibt_results')
+        requests = FriendshipRequestSerializer(requests, many=True, context=context)
         requests = requests.data
 
-    friends = user.friends.all()
+    friends = user.friends.prefetch_related('mibt_results')
 
     return JsonResponse({
-        'user': UserSerializer(user).data,
-        'friends': UserSerializer(friends, many=True).data,
+        'user': UserSerializer(user, context=context).data,
+        'friends': UserSerializer(friends, many=True, context=context).data,
         'requests': requests
     }, safe=False)
 
 
 @api_view(['GET'])
 def my_friendship_suggestions(request):
-    serializer = UserSerializer(request.user.people_you_may_know.all(), many=True)
+    serializer = UserSerializer(
+        request.user.people_you_may_know.prefetch_related('mibt_results'),
+        many=True,
+        context={'request': request, 'fields': requested_fields(request)}
+    )
 
     return JsonResponse(serializer.data, safe=False)
 
 
 @api_view(['POST'])
+@limit_uploads
 def editprofile(request):
     user = request.user
     name = request.data.get('name')
@@ -218,7 +233,8 @@ def editprofile(request):
     if show_likes_to_others is not None:
         # 转换字符串为布尔值
         user.show_likes_to_others = show_likes_to_others.lower() in ['true', '1', 't', 'y', 'yes']
-    user.save()
+    # 只写入资料字段，不覆盖并发更新的好友数、帖子数
+    user.save(update_fields=['name', 'bio', 'avatar', 'show_likes_to_others'])
     
     # 更新返回的用户数据，添加show_likes_to_others字段
     return JsonResponse({
@@ -283,16 +299,18 @@ def handle_request(request, pk, status):
     friendship_request = FriendshipRequest.objects.filter(created_for=request.user).get(created_by=user)
     
     if status == FriendshipRequest.ACCEPTED:
-        friendship_request.status = status
-        friendship_request.save()
-        
-        user.friends.add(request.user)
-        user.friends_count = user.friends_count + 1
-        user.save()
-
         request_user = request.user
-        request_user.friends_count = request_user.friends_count + 1
-        request_user.save()
+
+        with transaction.atomic():
+            friendship_request.status = status
+            friendship_request.save(update_fields=['status'])
+
+            user.friends.add(request_user)
+            # 计数器在数据库中原子自增，避免并发时读改写丢失更新
+            User.objects.filter(pk__in=[user.pk, request_user.pk]).update(friends_count=F('friends_count') + 1)
+
+        invalidate_friend_ids(user.id, request_user.id)
+        backfill_friendship(request_user, user)
 
         notification = create_notification(request, 'accepted_friendrequest', friendrequest_id=friendship_request.id)
         
@@ -429,7 +447,7 @@ def change_password(request):
     
     # 更新密码
     request.user.set_password(data['new_password'])
-    request.user.save()
+    request.user.save(update_fields=['password'])
     
     return JsonResponse({
         'success': True,
@@ -451,20 +469,21 @@ def remove_friend(request, pk):
     if not user.friends.filter(id=friend.id).exists():
         return JsonResponse({'success': False, 'message': '该用户不是你的好友'}, status=400)
     
-    # 移除好友关系（双向）
-    user.friends.remove(friend)
-    friend.friends.remove(user)
-    
-    # 从"可能认识的人"中移除（双向）
-    user.people_you_may_know.remove(friend)
-    friend.people_you_may_know.remove(user)
-    
-    # 更新好友数量
-    user.friends_count = max(0, user.friends_count - 1)  # 确保不会小于0
-    friend.friends_count = max(0, friend.friends_count - 1)  # 确保不会小于0
-    
-    user.save()
-    friend.save()
+    with transaction.atomic():
+        # 移除好友关系（双向）
+        user.friends.remove(friend)
+        friend.friends.remove(user)
+
+        # 从"可能认识的人"中移除（双向）
+        user.people_you_may_know.remove(friend)
+        friend.people_you_may_know.remove(user)
+
+        # 更新好友数量，确保不会小于0
+        User.objects.filter(pk__in=[user.pk, friend.pk]).update(friends_count=Greatest(F('friends_count') - 1, 0))
+
+    invalidate_friend_ids(user.id, friend.id)
+
+    prune_friendship(user, friend)
     
     # 删除FriendshipRequest记录（如果存在）
     try:
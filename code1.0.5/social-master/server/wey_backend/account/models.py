@@ -5,6 +5,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserM
 from django.db import models
 from django.utils import timezone
 
+from wey_backend.resize import resized_media_url
 
 
 class CustomUserManager(UserManager):
@@ -34,7 +35,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=255, blank=True, default='')
-    avatar = models.ImageField(upload_to='avatars', blank=True, null=True)
+    # 释放文件时按文件名检查引用（见 wey_backend.storage.is_file_referenced），需要索引
+    avatar = models.ImageField(upload_to='avatars', blank=True, null=True, db_index=True)
     bio = models.TextField(blank=True, null=True, verbose_name='个人介绍')
     friends = models.ManyToManyField('self')
     friends_count = models.IntegerField(default=0)
@@ -61,8 +63,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = []
 
     def get_avatar(self):
+        # 头像只在小尺寸显示，返回按 AVATAR_IMAGE_SIZE 缩放后的地址
         if self.avatar:
-            return settings.WEBSITE_URL + self.avatar.url
+            return resized_media_url(self.avatar.name, *settings.AVATAR_IMAGE_SIZE)
         else:
             return 'https://picsum.photos/200/200'
 
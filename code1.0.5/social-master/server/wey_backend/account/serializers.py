@@ -3,6 +3,83 @@ from rest_framework import serializers
 from .models import User, FriendshipRequest, MibtTestResult
 
 
+def parse_fields(value):
+    """
+    解析 ?fields= 参数，例如 "id,body,created_by.name,created_by.get_avatar"
+
+    返回嵌套字典，值为 None 表示该字段完整输出；没有传参时返回 None
+    """
+    if not value:
+        return None
+
+    selection = {}
+
+    for path in value.split(','):
+        names = [name.strip() for name in path.split('.') if name.strip()]
+        node = selection
+
+        for index, name in enumerate(names):
+            if index == len(names) - 1:
+                node.setdefault(name, None)
+            else:
+                if node.get(name) is None and name in node:
+                    # 已经要求完整输出该字段，不再收窄
+                    break
+                node = node.setdefault(name, {})
+
+    return selection or None
+
+
+def requested_fields(request):
+    return parse_fields(request.GET.get('fields')) if request is not None else None
+
+
+def is_field_requested(selection, *path):
+    """判断某个（嵌套）字段是否会被输出，用于决定是否需要预取关联数据"""
+    for name in path:
+        if selection is None:
+            return True
+        if name not in selection:
+            return False
+        selection = selection[name]
+
+    return True
+
+
+class SparseFieldsMixin:
+    """
+    按上下文中的 fields 选择输出字段，未选中的字段（包括嵌套序列化器）完全不执行，
+    也就不会触发对应的关联查询
+    """
+
+    def get_field_selection(self):
+        selection = self.context.get('fields')
+        if selection is None:
+            return None
+
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+
+        for name in reversed(path):
+            selection = selection.get(name)
+            if selection is None:
+                return None
+
+        return selection
+
+    @property
+    def _readable_fields(self):
+        selection = self.get_field_selection()
+
+        for field in super()._readable_fields:
+            if selection is None or field.field_name in selection:
+                yield field
+
+
 class MibtTestResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = MibtTestResult
@@ -22,22 +99,33 @@ class MibtTestResultSerializer(serializers.ModelSerializer):
         )
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     mbti_result = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ('id', 'name', 'email', 'friends_count', 'posts_count', 'get_avatar', 'bio', 'mbti_result', 'is_admin', 'is_active', 'date_joined', 'show_likes_to_others')
+
+    def to_representation(self, instance):
+        # 同一个响应里的用户卡片按ID缓存在上下文中，帖子作者、评论者等重复出现时只渲染一次
+        user_cards = self.context.setdefault('user_cards', {})
+        key = (instance.pk, repr(self.get_field_selection()))
+
+        if key not in user_cards:
+            user_cards[key] = super().to_representation(instance)
+
+        return user_cards[key].copy()
     
     def get_mbti_result(self, obj):
-        try:
-            mibt_result = MibtTestResult.objects.get(user=obj)
-            return MibtTestResultSerializer(mibt_result).data
-        except MibtTestResult.DoesNotExist:
+        # 列表接口通过 prefetch_related('mibt_results') 预取，这里直接读取缓存，不再逐个用户查询
+        mibt_result = max(obj.mibt_results.all(), key=lambda result: result.created_at, default=None)
+
+        if mibt_result is None:
             return None
+        return MibtTestResultSerializer(mibt_result).data
 
 
-class FriendshipRequestSerializer(serializers.ModelSerializer):
+class FriendshipRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     
     class Meta:
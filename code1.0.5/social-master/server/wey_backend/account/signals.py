@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from wey_backend.storage import release_file
+
+from .models import User
+
+
+@receiver(pre_save, sender=User)
+def remember_old_avatar(sender, instance, update_fields=None, **kwargs):
+    # 只在可能修改头像的保存中多查一次旧头像
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+
+    instance._old_avatar = User.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def release_replaced_avatar(sender, instance, **kwargs):
+    """更换头像后释放旧文件，仍被其他记录引用的文件会保留"""
+    old_avatar = getattr(instance, '_old_avatar', None)
+    instance._old_avatar = None
+
+    if old_avatar and old_avatar != instance.avatar.name:
+        transaction.on_commit(lambda: release_file(old_avatar))
+
+
+@receiver(post_delete, sender=User)
+def release_deleted_avatar(sender, instance, **kwargs):
+    if instance.avatar:
+        avatar = instance.avatar.name
+        transaction.on_commit(lambda: release_file(avatar))
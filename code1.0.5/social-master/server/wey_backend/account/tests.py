@@ -1,3 +1,53 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .models import User
+
+
+def png_upload(name='avatar.png', size=(8, 8)):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'red').save(output, format='PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+class AvatarUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(name='user', email='user@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_accepts_images(self):
+        response = self.client.post('/api/editprofile/', {'name': 'renamed', 'avatar': png_upload()})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'renamed')
+        self.assertTrue(self.user.avatar.name.startswith('avatars/'))
+
+    def test_rejects_non_images_before_saving(self):
+        text = SimpleUploadedFile('avatar.png', b'plain text', content_type='image/png')
+        response = self.client.post('/api/editprofile/', {'name': 'renamed', 'avatar': text})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'avatar.png 不是支持的图片格式'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'user')
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=64)
+    def test_rejects_large_files(self):
+        response = self.client.post('/api/editprofile/', {'name': 'renamed', 'avatar': png_upload(size=(64, 64))})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('单个文件不能超过', response.json()['error'])
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+# 好友ID列表的缓存时间，好友关系变化时通过版本号主动失效
+FRIEND_IDS_TIMEOUT = 60 * 60
+
+# 缓存需要多个进程共享（Redis、Memcached 等）：进程内缓存中各个 worker 的版本号互不相通，
+# 一个进程里的好友变化不能让其他进程的缓存失效，时间线扩散会按过期的好友列表写入。
+# 默认配置下没有共享缓存，此时不缓存，每次直接查询
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache_configured():
+    """默认缓存是否为多进程共享的后端；依赖缓存在进程间传递状态的功能都要先检查"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def friend_ids_cache_enabled():
+    return shared_cache_configured()
+
+
+def _friend_ids_version_key(user_id):
+    return f"friend_ids_version_{user_id}"
+
+
+def get_friend_ids(user):
+    """获取用户的好友ID列表，配置了共享缓存时优先读取缓存，不再加载完整的 User 行"""
+    if not friend_ids_cache_enabled():
+        return list(user.friends.values_list('id', flat=True))
+
+    version = cache.get_or_set(_friend_ids_version_key(user.id), 1, None)
+    cache_key = f"friend_ids_{user.id}_{version}"
+
+    friend_ids = cache.get(cache_key)
+
+    if friend_ids is None:
+        friend_ids = list(user.friends.values_list('id', flat=True))
+        cache.set(cache_key, friend_ids, FRIEND_IDS_TIMEOUT)
+
+    return friend_ids
+
+
+def invalidate_friend_ids(*user_ids):
+    """好友关系变化后递增版本号，旧版本的缓存自然失效"""
+    if not friend_ids_cache_enabled():
+        return
+
+    for user_id in user_ids:
+        try:
+            cache.incr(_friend_ids_version_key(user_id))
+        except ValueError:
+            # 还没有缓存过，无需处理
+            pass
@@ -3,6 +3,7 @@ from django.http import JsonResponse
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 
 from account.models import User
+from account.serializers import is_field_requested, requested_fields
 
 from .models import Conversation, ConversationMessage
 from .serializers import ConversationSerializer, ConversationDetailSerializer, ConversationMessageSerializer
@@ -10,16 +11,26 @@ from .serializers import ConversationSerializer, ConversationDetailSerializer, C
 
 @api_view(['GET'])
 def conversation_list(request):
-    conversations = Conversation.objects.filter(users__in=list([request.user]))
-    serializer = ConversationSerializer(conversations, many=True)
+    conversations = Conversation.objects.filter(users__in=list([request.user])).prefetch_related('users__mibt_results')
+    serializer = ConversationSerializer(conversations, many=True, context={'request': request, 'fields': requested_fields(request)})
 
     return JsonResponse(serializer.data, safe=False)
 
 
 @api_view(['GET'])
 def conversation_detail(request, pk):
-    conversation = Conversation.objects.filter(users__in=list([request.user])).get(pk=pk)
-    serializer = ConversationDetailSerializer(conversation)
+    fields = requested_fields(request)
+
+    # 只预取会被输出的消息用户
+    lookups = []
+    for user_field in ('created_by', 'sent_to'):
+        if is_field_requested(fields, 'messages', user_field, 'mbti_result'):
+            lookups.append(f'messages__{user_field}__mibt_results')
+        elif is_field_requested(fields, 'messages', user_field):
+            lookups.append(f'messages__{user_field}')
+
+    conversation = Conversation.objects.filter(users__in=list([request.user])).prefetch_related(*lookups).get(pk=pk)
+    serializer = ConversationDetailSerializer(conversation, context={'request': request, 'fields': fields})
 
     return JsonResponse(serializer.data, safe=False)
 
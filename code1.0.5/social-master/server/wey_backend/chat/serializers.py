@@ -1,11 +1,11 @@
 from rest_framework import serializers
 
-from account.serializers import UserSerializer
+from account.serializers import SparseFieldsMixin, UserSerializer
 
 from .models import Conversation, ConversationMessage
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     users = UserSerializer(read_only=True, many=True)
 
     class Meta:
@@ -13,7 +13,7 @@ class ConversationSerializer(serializers.ModelSerializer):
         fields = ('id', 'users', 'modified_at_formatted',)
 
 
-class ConversationMessageSerializer(serializers.ModelSerializer):
+class ConversationMessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sent_to = UserSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
 
@@ -22,7 +22,7 @@ class ConversationMessageSerializer(serializers.ModelSerializer):
         fields = ('id', 'sent_to', 'created_by', 'created_at_formatted', 'body',)
 
 
-class ConversationDetailSerializer(serializers.ModelSerializer):
+class ConversationDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     messages = ConversationMessageSerializer(read_only=True, many=True)
 
     class Meta:
@@ -1,6 +1,8 @@
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
 from django.utils.timesince import timesince
 from django.utils import timezone
 
@@ -12,9 +14,11 @@ from account.admin_api import IsAdminPermission
 from account.models import User
 from account.serializers import UserSerializer
 
-from .models import Post, Comment, Like, PostAttachment, Trend, PostReport
+from .models import Post, Comment, PostAttachment, Trend, PostReport
 from .serializers import PostSerializer, PostDetailSerializer, PostAttachmentSerializer, PostReportSerializer
 from .forms import PostForm, AttachmentForm
+from .timeline import fan_out_post, sync_post_visibility
+from .utils import add_post_attachments, like_context, parse_id_list, prefetch_post_relations, sync_hashtags
 
 
 class PostPagination(PageNumberPagination):
@@ -23,6 +27,18 @@ class PostPagination(PageNumberPagination):
     max_page_size = 50
 
 
+def _resolve_attachments(attachment_ids):
+    """一次查询取出客户端指定的附件，不存在的ID直接忽略；格式错误时抛出 ValueError"""
+    ids = parse_id_list(attachment_ids)
+    return list(PostAttachment.objects.filter(id__in=ids)) if ids else []
+
+
+def _detail_context(request, post):
+    """帖子详情的序列化上下文：预取评论并批量解析帖子和评论的点赞状态"""
+    prefetch_post_relations([post], with_comments=True)
+    return like_context(request, posts=[post], comments=post.preview_comments)
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminPermission])
 def admin_posts_list(request):
@@ -73,8 +89,8 @@ def admin_posts_list(request):
     
     # 分页
     paginator = PostPagination()
-    result_page = paginator.paginate_queryset(posts, request)
-    serializer = PostSerializer(result_page, many=True, context={'request': request})
+    result_page = prefetch_post_relations(paginator.paginate_queryset(posts, request))
+    serializer = PostSerializer(result_page, many=True, context=like_context(request, posts=result_page))
     
     # 为每个帖子添加报告计数
     post_data = serializer.data
@@ -92,10 +108,10 @@ def admin_posts_list(request):
 def admin_post_detail(request, post_id):
     """获取特定帖子详情，仅限管理员访问"""
     post = get_object_or_404(Post, id=post_id)
-    serializer = PostDetailSerializer(post, context={'request': request})
+    serializer = PostDetailSerializer(post, context=_detail_context(request, post))
     
     # 获取举报该帖子的用户列表
-    reported_by = post.reported_by_users.all()
+    reported_by = post.reported_by_users.prefetch_related('mibt_results')
     reported_by_serializer = UserSerializer(reported_by, many=True)
     
     data = serializer.data
@@ -122,25 +138,28 @@ def admin_create_post(request):
     else:
         user = request.user
     
+    try:
+        attachments = _resolve_attachments(data.get('attachments', []))
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'附件ID无效: {e}'
+        }, status=400)
+
     # 创建帖子
-    post = Post.objects.create(
-        body=data.get('body', ''),
-        is_private=data.get('is_private', False),
-        created_by=user
-    )
-    
-    # 处理附件
-    attachments = data.get('attachments', [])
-    for attachment_id in attachments:
-        try:
-            attachment = PostAttachment.objects.get(id=attachment_id)
-            post.attachments.add(attachment)
-        except PostAttachment.DoesNotExist:
-            pass
-    
-    post.save()
+    with transaction.atomic():
+        post = Post.objects.create(
+            body=data.get('body', ''),
+            is_private=data.get('is_private', False),
+            created_by=user
+        )
+        User.objects.filter(pk=user.pk).update(posts_count=F('posts_count') + 1)
+        add_post_attachments(post, attachments)
+
+    sync_hashtags(post)
+    fan_out_post(post)
     
-    serializer = PostDetailSerializer(post, context={'request': request})
+    serializer = PostDetailSerializer(post, context=_detail_context(request, post))
     
     return JsonResponse({
         'success': True,
@@ -159,25 +178,30 @@ def admin_update_post(request, post_id):
     if 'body' in data:
         post.body = data['body']
     
+    was_private = post.is_private
     if 'is_private' in data:
         post.is_private = data['is_private']
     
-    # 处理附件
+    # 处理附件：用新的附件列表替换现有附件
     if 'attachments' in data:
-        # 清除现有附件
-        post.attachments.clear()
-        
-        # 添加新附件
-        for attachment_id in data['attachments']:
-            try:
-                attachment = PostAttachment.objects.get(id=attachment_id)
-                post.attachments.add(attachment)
-            except PostAttachment.DoesNotExist:
-                pass
-    
-    post.save()
+        try:
+            post.attachments.set(_resolve_attachments(data['attachments']))
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'附件ID无效: {e}'
+            }, status=400)
+    
+    # 只写入可编辑的字段，不覆盖并发更新的点赞数、评论数
+    post.save(update_fields=['body', 'is_private'])
+
+    if 'body' in data:
+        sync_hashtags(post)
+
+    if post.is_private != was_private:
+        sync_post_visibility(post)
     
-    serializer = PostDetailSerializer(post, context={'request': request})
+    serializer = PostDetailSerializer(post, context=_detail_context(request, post))
     
     return JsonResponse({
         'success': True,
@@ -192,7 +216,9 @@ def admin_delete_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     
     # 删除帖子
-    post.delete()
+    with transaction.atomic():
+        post.delete()
+        User.objects.filter(pk=post.created_by_id).update(posts_count=Greatest(F('posts_count') - 1, 0))
     
     return JsonResponse({
         'success': True,
@@ -209,15 +235,16 @@ def admin_post_reports(request):
     
     # 分页
     paginator = PostPagination()
-    result_page = paginator.paginate_queryset(reported_posts, request)
-    post_serializer = PostSerializer(result_page, many=True, context={'request': request})
+    result_page = prefetch_post_relations(paginator.paginate_queryset(reported_posts, request))
+    context = like_context(request, posts=result_page)
+    post_serializer = PostSerializer(result_page, many=True, context=context)
     
     # 获取每个帖子的举报详情
     posts_data = []
     for post in post_serializer.data:
         post_obj = Post.objects.get(id=post['id'])
-        reports = PostReport.objects.filter(post=post_obj)
-        report_serializer = PostReportSerializer(reports, many=True, context={'request': request})
+        reports = PostReport.objects.filter(post=post_obj).prefetch_related('reported_by__mibt_results')
+        report_serializer = PostReportSerializer(reports, many=True, context=context)
         
         post_with_reports = {
             'post': post,
@@ -261,16 +288,19 @@ def admin_post_statistics(request):
     reported_posts = Post.objects.annotate(report_count=Count('reported_by_users')).filter(report_count__gt=0).count()
     
     # 获取最近发布的帖子
-    recent_posts = Post.objects.order_by('-created_at')[:5]
-    recent_posts_serializer = PostSerializer(recent_posts, many=True, context={'request': request})
+    recent_posts = list(Post.objects.order_by('-created_at')[:5])
     
     # 获取最多评论的帖子
-    most_commented = Post.objects.order_by('-comments_count')[:5]
-    most_commented_serializer = PostSerializer(most_commented, many=True, context={'request': request})
+    most_commented = list(Post.objects.order_by('-comments_count')[:5])
     
     # 获取最多点赞的帖子
-    most_liked = Post.objects.order_by('-likes_count')[:5]
-    most_liked_serializer = PostSerializer(most_liked, many=True, context={'request': request})
+    most_liked = list(Post.objects.order_by('-likes_count')[:5])
+
+    prefetch_post_relations(recent_posts + most_commented + most_liked)
+    context = like_context(request, posts=recent_posts + most_commented + most_liked)
+    recent_posts_serializer = PostSerializer(recent_posts, many=True, context=context)
+    most_commented_serializer = PostSerializer(most_commented, many=True, context=context)
+    most_liked_serializer = PostSerializer(most_liked, many=True, context=context)
     
     # 获取热门话题
     trends = Trend.objects.order_by('-occurences')[:50]
@@ -357,21 +387,18 @@ def admin_delete_comment(request, post_id, comment_id):
     comment = get_object_or_404(Comment, id=comment_id)
     
     # 确保要删除的评论属于指定的帖子
-    if comment not in post.comments.all():
+    if comment.post_id != post.id:
         return JsonResponse({
             'success': False,
             'message': '评论不属于指定帖子'
         }, status=400)
     
-    # 从帖子的评论中移除该评论
-    post.comments.remove(comment)
-    
-    # 更新帖子的评论计数
-    post.comments_count = post.comments.count()
-    post.save()
-    
-    # 删除评论
-    comment.delete()
+    with transaction.atomic():
+        # 更新帖子的评论计数
+        Post.objects.filter(pk=post.pk).update(comments_count=Greatest(F('comments_count') - 1, 0))
+
+        # 删除评论
+        comment.delete()
     
     return JsonResponse({
         'success': True,
@@ -1,4 +1,7 @@
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.http import JsonResponse
 from django.http.response import HttpResponseBadRequest
 
@@ -7,92 +10,376 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from account.models import User, FriendshipRequest
-from account.serializers import UserSerializer
+from account.serializers import UserSerializer, is_field_requested, requested_fields
+from account.utils import get_friend_ids
 from notification.utils import create_notification
+from wey_backend.uploads import limit_uploads
 
+from .conditional import conditional_get, fingerprint
+from .counters import get_pending_like_deltas
 from .forms import PostForm, AttachmentForm
-from .models import Post, Like, Comment, Trend, PostReport
+from .images import enqueue_attachment_processing, read_dimensions
+from .models import Post, PostAttachment, PostLike, Comment, CommentLike, Trend, PostReport
+from .pagination import InvalidCursor, paginate_by_cursor, split_page, wants_cursor_page
+from .ranking import paginate_ranked
+from .timeline import fan_out_post, read_timeline, sync_post_visibility, timeline_enabled
+from .utils import (
+    add_post_attachments, get_liked_comment_ids, get_liked_post_ids, like_context, normalize_hashtag, parse_id_list,
+    prefetch_comment_relations, prefetch_post_relations, sync_hashtags, toggle_like
+)
 from .serializers import PostSerializer, PostDetailSerializer, CommentSerializer, TrendSerializer, PostReportSerializer
 
 
+def _feed_queryset(request):
+    if timeline_enabled():
+        # 时间线在写入时已经按可见性规则扩散好，这里只需按 owner 读取
+        posts = Post.objects.filter(timeline_entries__owner=request.user)
+    else:
+        # 修改查询逻辑：获取自己的所有帖子(包括私密)和好友的公开帖子
+        posts = Post.objects.filter(
+            Q(created_by=request.user) |  # 自己的所有帖子
+            (Q(created_by_id__in=get_friend_ids(request.user)) & Q(is_private=False))  # 好友的公开帖子
+        )
+
+    trend = request.GET.get('trend', '')
+
+    if trend:
+        posts = posts.filter(hashtags__tag=normalize_hashtag(trend)).filter(is_private=False)
+
+    return posts
+
+
+def _feed_page(request):
+    """
+    本次请求要返回的 (这一页帖子, 下一页游标, 序列化上下文)，同一请求内只查询一次
+
+    _feed_etag 按这一页计算校验值，post_list 直接复用；游标无效时抛出 InvalidCursor
+    """
+    if not hasattr(request, '_feed_page'):
+        posts = _feed_queryset(request)
+        next_cursor = None
+
+        # 游标分页：时间序按 (created_at, id) 取下一页，热度排序按 (得分, created_at, id) 取下一页；
+        # 时间线先按索引取出这一页的条目再取帖子
+        if request.GET.get('mode') == 'ranked':
+            page, next_cursor = paginate_ranked(posts, request)
+        elif timeline_enabled() and not request.GET.get('trend'):
+            page, next_cursor = read_timeline(request.user, request)
+        elif wants_cursor_page(request):
+            page, next_cursor = paginate_by_cursor(posts, request)
+        else:
+            page = list(posts)
+
+        prefetch_post_relations(page, fields=requested_fields(request))
+        request._feed_page = (page, next_cursor, like_context(request, posts=page))
+
+    return request._feed_page
+
+
+def _field_values(instance):
+    return tuple(field.value_from_object(instance) for field in instance._meta.concrete_fields)
+
+
+def _user_state(user, fields, *path):
+    """用户卡片的校验值：全部字段，以及请求了 mbti_result 时预取的测试结果；没有请求该用户时为 None"""
+    if not is_field_requested(fields, *path):
+        return None
+
+    mbti_results = None
+    if is_field_requested(fields, *path, 'mbti_result'):
+        mbti_results = sorted(_field_values(result) for result in user.mibt_results.all())
+    return _field_values(user), mbti_results
+
+
+def _page_state(posts, context, comments=None):
+    """
+    一页内容实际返回部分的校验值：帖子、作者、附件和评论、评论者的全部字段，
+    当前用户的点赞状态和尚未写回的点赞增量
+
+    正文修改、附件处理完成、作者或评论者改名、换头像都会改变校验值；没有请求的关联不读取，避免额外查询
+    """
+    fields = context['fields']
+    with_attachments = is_field_requested(fields, 'attachments')
+
+    return (
+        [
+            (
+                _field_values(post),
+                _user_state(post.created_by, fields, 'created_by'),
+                [_field_values(attachment) for attachment in post.attachments.all()] if with_attachments else None,
+            )
+            for post in posts
+        ],
+        [
+            (_field_values(comment), _user_state(comment.created_by, fields, 'comments', 'created_by'))
+            for comment in comments or ()
+        ],
+        sorted(context.get('liked_post_ids', ())),
+        sorted(context.get('liked_comment_ids', ())),
+        sorted(context.get('pending_like_deltas', {}).items()),
+    )
+
+
+def _feed_etag(request):
+    try:
+        page, next_cursor, context = _feed_page(request)
+    except InvalidCursor:
+        return None
+
+    return fingerprint(
+        request.user.id,
+        request.GET.urlencode(),
+        next_cursor,
+        _page_state(page, context)
+    )
+
+
+def _profile_page(request, id):
+    """
+    post_list_profile 返回的内容，同一请求内只查询一次：
+    (用户, 帖子列表, 序列化上下文, 是否好友, 能否发送好友请求)，用户不存在时为 None
+    """
+    if not hasattr(request, '_profile_page'):
+        user = User.objects.prefetch_related('mibt_results').filter(pk=id).first()
+        request._profile_page = None if user is None else _build_profile_page(request, user)
+
+    return request._profile_page
+
+
+def _build_profile_page(request, user):
+    # 本人可以看到所有帖子，其他人（包括好友）只能看到公开帖子
+    posts = Post.objects.filter(created_by_id=user.id)
+    if request.user.id != user.id:
+        posts = posts.filter(is_private=False)
+
+    posts = prefetch_post_relations(list(posts), fields=requested_fields(request))
+    context = like_context(request, posts=posts)
+
+    is_friend = user.id in get_friend_ids(request.user)
+    has_request = FriendshipRequest.objects.filter(
+        Q(created_for=request.user, created_by=user) |
+        Q(created_for=user, created_by=request.user)
+    ).exists()
+
+    return user, posts, context, is_friend, not is_friend and not has_request
+
+
+def _profile_etag(request, id):
+    page = _profile_page(request, id)
+    if page is None:
+        return None
+
+    user, posts, context, is_friend, can_send_friendship_request = page
+
+    return fingerprint(
+        request.user.id,
+        request.GET.urlencode(),
+        _user_state(user, context['fields']),
+        is_friend,
+        can_send_friendship_request,
+        _page_state(posts, context)
+    )
+
+
+def _detail_page(request, pk):
+    """
+    post_detail 返回的内容，同一请求内只查询一次：
+    (帖子, 预览评论, 评论的下一页游标, 序列化上下文)，帖子不存在或无权查看时为 None
+    """
+    if not hasattr(request, '_detail_page'):
+        post = _visible_posts(request).filter(pk=pk).first()
+        request._detail_page = None if post is None else _build_detail_page(request, post)
+
+    return request._detail_page
+
+
+def _build_detail_page(request, post):
+    fields = requested_fields(request)
+    comments = None
+    comments_cursor = None
+
+    if is_field_requested(fields, 'comments'):
+        # 只预取前几条评论（多取一条判断是否还有更多），其余通过评论列表接口分页加载
+        limit = _preview_comments_limit(request)
+        prefetch_post_relations([post], with_comments=True, fields=fields, comments_limit=limit + 1)
+        comments, comments_cursor = split_page(post.preview_comments, limit)
+        post.preview_comments = comments
+    else:
+        prefetch_post_relations([post], fields=fields)
+
+    return post, comments, comments_cursor, like_context(request, posts=[post], comments=comments)
+
+
+def _detail_etag(request, pk):
+    page = _detail_page(request, pk)
+    if page is None:
+        return None
+
+    post, comments, comments_cursor, context = page
+
+    return fingerprint(
+        request.user.id,
+        request.GET.urlencode(),
+        comments_cursor,
+        _page_state([post], context, comments)
+    )
+
+
 @api_view(['GET'])
+@conditional_get(_feed_etag)
 def post_list(request):
-    user_ids = [request.user.id]
+    try:
+        page, next_cursor, context = _feed_page(request)
+    except InvalidCursor:
+        return JsonResponse({'error': '无效的游标'}, status=400)
 
-    for user in request.user.friends.all():
-        user_ids.append(user.id)
+    serializer = PostSerializer(page, many=True, context=context)
 
-    # 修改查询逻辑：获取自己的所有帖子(包括私密)和好友的公开帖子
-    posts = Post.objects.filter(
+    if request.GET.get('mode') != 'ranked' and not wants_cursor_page(request):
+        return JsonResponse(serializer.data, safe=False)
+
+    return JsonResponse({
+        'posts': serializer.data,
+        'next_cursor': next_cursor
+    })
+
+
+def _visible_posts(request):
+    # 只能查看自己的私密帖子或任何人的公开帖子
+    return Post.objects.filter(
         Q(created_by=request.user) |  # 自己的所有帖子
-        (Q(created_by_id__in=list(user_ids)) & Q(is_private=False))  # 好友的公开帖子
+        Q(is_private=False)  # 任何人的公开帖子
     )
 
-    trend = request.GET.get('trend', '')
-
-    if trend:
-        posts = posts.filter(body__icontains='#' + trend).filter(is_private=False)
 
-    serializer = PostSerializer(posts, many=True, context={'request': request})
+def _preview_comments_limit(request):
+    """读取 comments 参数：帖子详情中预览的评论条数"""
+    try:
+        limit = int(request.GET.get('comments', settings.POST_DETAIL_PREVIEW_COMMENTS))
+    except (TypeError, ValueError):
+        limit = settings.POST_DETAIL_PREVIEW_COMMENTS
 
-    return JsonResponse(serializer.data, safe=False)
+    return max(1, min(limit, settings.FEED_MAX_PAGE_SIZE))
 
 
 @api_view(['GET'])
+@conditional_get(_detail_etag)
 def post_detail(request, pk):
-    user_ids = [request.user.id]
+    page = _detail_page(request, pk)
+    if page is None:
+        return JsonResponse({'error': '帖子不存在或您无权查看'}, status=404)
 
-    for user in request.user.friends.all():
-        user_ids.append(user.id)
+    post, _, comments_cursor, context = page
 
-    # 只能查看自己的私密帖子或任何人的公开帖子
+    return JsonResponse({
+        'post': PostDetailSerializer(post, context=context).data,
+        'comments_next_cursor': comments_cursor
+    })
+
+
+@api_view(['GET'])
+def post_batch(request):
+    """
+    按ID列表批量获取帖子（?ids=id1,id2,...），可见性规则与帖子详情相同
+
+    返回以ID为键的帖子字典，不存在或无权查看的ID列在 missing 中
+    """
     try:
-        post = Post.objects.filter(
-            Q(created_by=request.user) |  # 自己的所有帖子
-            Q(is_private=False)  # 任何人的公开帖子
-        ).get(pk=pk)
-        
-        return JsonResponse({
-            'post': PostDetailSerializer(post, context={'request': request}).data
-        })
-    except Post.DoesNotExist:
-        return JsonResponse({'error': '帖子不存在或您无权查看'}, status=404)
+        ids = parse_id_list(request.GET.get('ids', ''), settings.POST_BATCH_MAX_IDS)
+    except ValueError:
+        return JsonResponse({'error': f'ids 须为逗号分隔的帖子ID，最多 {settings.POST_BATCH_MAX_IDS} 个'}, status=400)
+
+    posts = list(_visible_posts(request).filter(pk__in=ids)) if ids else []
+    prefetch_post_relations(posts, fields=requested_fields(request))
+
+    serializer = PostSerializer(posts, many=True, context=like_context(request, posts=posts))
+    found = {str(post.id): data for post, data in zip(posts, serializer.data)}
+
+    return JsonResponse({
+        'posts': found,
+        'missing': [str(post_id) for post_id in ids if str(post_id) not in found]
+    })
+
+
+@api_view(['POST'])
+def post_state(request):
+    """
+    批量刷新帖子和评论的点赞数、评论数以及当前用户的点赞状态
+
+    请求体为 {"post_ids": [...], "comment_ids": [...]}，只返回当前用户可见的对象，
+    查询次数固定，与ID数量无关
+    """
+    try:
+        post_ids = parse_id_list(request.data.get('post_ids'), settings.POST_STATE_MAX_IDS)
+        comment_ids = parse_id_list(request.data.get('comment_ids'), settings.POST_STATE_MAX_IDS)
+    except ValueError:
+        return JsonResponse({'error': f'post_ids 和 comment_ids 须为ID列表，每类最多 {settings.POST_STATE_MAX_IDS} 个'}, status=400)
+
+    visible_posts = _visible_posts(request)
+    posts = {}
+    comments = {}
+
+    if post_ids:
+        rows = visible_posts.filter(pk__in=post_ids).values_list('id', 'likes_count', 'comments_count')
+        pending = get_pending_like_deltas(post_ids)
+        liked = get_liked_post_ids(request.user, post_ids)
+
+        for post_id, likes_count, comments_count in rows:
+            posts[str(post_id)] = {
+                'likes_count': likes_count + pending.get(post_id, 0),
+                'comments_count': comments_count,
+                'islike': post_id in liked,
+            }
+
+    if comment_ids:
+        rows = Comment.objects.filter(pk__in=comment_ids, post__in=visible_posts).values_list('id', 'likes_count')
+        liked = get_liked_comment_ids(request.user, comment_ids)
+
+        for comment_id, likes_count in rows:
+            comments[str(comment_id)] = {
+                'likes_count': likes_count,
+                'islike': comment_id in liked,
+            }
+
+    return JsonResponse({
+        'posts': posts,
+        'comments': comments
+    })
 
 
 @api_view(['GET'])
-def post_list_profile(request, id):   
-    user = User.objects.get(pk=id)
-    
-    # 检查是否为本人
-    is_self = request.user.id == user.id
-    
-    # 根据访问者身份过滤帖子
-    if is_self:
-        # 如果是本人，显示所有帖子
-        posts = Post.objects.filter(created_by_id=id)
-    else:
-        # 如果是其他人（包括好友），只显示公开帖子
-        posts = Post.objects.filter(created_by_id=id, is_private=False)
+def post_comments(request, pk):
+    """帖子的评论列表，按发布时间正序游标分页"""
+    if not _visible_posts(request).filter(pk=pk).exists():
+        return JsonResponse({'error': '帖子不存在或您无权查看'}, status=404)
 
-    posts_serializer = PostSerializer(posts, many=True, context={'request': request})
-    user_serializer = UserSerializer(user)
+    try:
+        comments, next_cursor = paginate_by_cursor(Comment.objects.filter(post_id=pk), request, descending=False)
+    except InvalidCursor:
+        return JsonResponse({'error': '无效的游标'}, status=400)
 
-    # 判断是否为好友
-    is_friend = request.user in user.friends.all()
-    can_send_friendship_request = True
+    fields = requested_fields(request)
+    prefetch_comment_relations(comments, fields=fields)
+    context = like_context(request, comments=comments, comments_path=())
 
-    if is_friend:
-        can_send_friendship_request = False
-    
-    check1 = FriendshipRequest.objects.filter(created_for=request.user).filter(created_by=user)
-    check2 = FriendshipRequest.objects.filter(created_for=user).filter(created_by=request.user)
+    return JsonResponse({
+        'comments': CommentSerializer(comments, many=True, context=context).data,
+        'next_cursor': next_cursor
+    })
 
-    if check1 or check2:
-        can_send_friendship_request = False
+
+@api_view(['GET'])
+@conditional_get(_profile_etag)
+def post_list_profile(request, id):
+    page = _profile_page(request, id)
+    if page is None:
+        return JsonResponse({'error': '用户不存在'}, status=404)
+
+    user, posts, context, is_friend, can_send_friendship_request = page
 
     return JsonResponse({
-        'posts': posts_serializer.data,
-        'user': user_serializer.data,
+        'posts': PostSerializer(posts, many=True, context=context).data,
+        'user': UserSerializer(user, context=context).data,
         'can_send_friendship_request': can_send_friendship_request,
         'is_friend': is_friend
     }, safe=False)
@@ -100,126 +387,120 @@ def post_list_profile(request, id):
 
 @api_view(['GET'])
 def post_list_liked(request, id):
-    user = User.objects.get(pk=id)
+    user = User.objects.only('id', 'show_likes_to_others').get(pk=id)
     
     # 检查是否为本人
     is_self = request.user.id == user.id
+    paginated = wants_cursor_page(request)
     
     # 如果不是本人查看，且用户设置了不向其他人显示点赞内容，则返回空列表
     if not is_self and not user.show_likes_to_others:
+        if paginated:
+            return JsonResponse({'posts': [], 'next_cursor': None})
         return JsonResponse([], safe=False)
     
-    # 获取用户点赞的所有帖子
-    likes = Like.objects.filter(created_by=user)
-    post_ids = []
-    
-    # 遍历所有点赞
-    for like in likes:
-        if is_self:
-            # 如果是查看自己的点赞，显示所有帖子
-            posts = Post.objects.filter(likes=like)
-        else:
-            # 如果查看他人的点赞，只显示公开帖子，或自己发的私密帖子
-            posts = Post.objects.filter(
-                Q(likes=like) & 
-                (Q(is_private=False) | Q(created_by=request.user))
-            )
-            
-        for post in posts:
-            post_ids.append(post.id)
-    
-    # 去重并获取帖子
-    unique_post_ids = list(set(post_ids))
-    liked_posts = Post.objects.filter(id__in=unique_post_ids)
+    # 从点赞表一侧连接帖子，一条查询按点赞时间倒序取出
+    likes = PostLike.objects.filter(created_by=user).select_related('post')
+
+    if not is_self:
+        # 如果查看他人的点赞，只显示公开帖子，或自己发的私密帖子
+        likes = likes.filter(Q(post__is_private=False) | Q(post__created_by=request.user))
+
+    if paginated:
+        try:
+            likes, next_cursor = paginate_by_cursor(likes, request)
+        except InvalidCursor:
+            return JsonResponse({'error': '无效的游标'}, status=400)
+    else:
+        likes = likes.order_by('-created_at', '-id')
+
+    liked_posts = prefetch_post_relations([like.post for like in likes], fields=requested_fields(request))
     
-    serializer = PostSerializer(liked_posts, many=True, context={'request': request})
+    serializer = PostSerializer(liked_posts, many=True, context=like_context(request, posts=liked_posts))
+
+    if paginated:
+        return JsonResponse({
+            'posts': serializer.data,
+            'next_cursor': next_cursor
+        })
+
     return JsonResponse(serializer.data, safe=False)
 
 
 @api_view(['POST'])
+@limit_uploads
 def post_create(request):
+    # 上传的数量、大小和文件头已由 UploadLimitHandler 在解析请求时检查，超出限制会直接返回 400
     form = PostForm(request.POST)
     
     # 获取附件数量
     attachments_count = request.POST.get('attachments_count')
     
-    if form.is_valid():
-        post = form.save(commit=False)
-        post.created_by = request.user
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors}, status=400)
+
+    # 先校验所有图片，任何一张无效都不创建帖子
+    attachment_forms = []
+    if attachments_count and int(attachments_count) > 0:
+        for image in request.FILES.getlist('image'):
+            attachment_form = AttachmentForm({}, {'image': image})
+            if not attachment_form.is_valid():
+                return JsonResponse({'error': attachment_form.errors}, status=400)
+            attachment_forms.append(attachment_form)
+
+    post = form.save(commit=False)
+    post.created_by = request.user
+    attachments = []
+
+    with transaction.atomic():
         post.save()
-        
-        # 处理多图片上传
-        if attachments_count and int(attachments_count) > 0:
-            try:
-                # 如果有传递多个图片，使用getlist获取所有图片
-                images = request.FILES.getlist('image')
-                
-                for image in images:
-                    # 为每个图片创建一个附件对象
-                    attachment_form = AttachmentForm({}, {'image': image})
-                    
-                    if attachment_form.is_valid():
-                        attachment = attachment_form.save(commit=False)
-                        attachment.created_by = request.user
-                        attachment.save()
-                        
-                        # 添加到帖子的附件中
-                        post.attachments.add(attachment)
-                    else:
-                        print(f"附件表单验证失败: {attachment_form.errors}")
-            except Exception as e:
-                print(f"处理附件时出错: {str(e)}")
-                # 错误不会中断创建帖子过程，但会记录错误
-
-        user = request.user
-        user.posts_count = user.posts_count + 1
-        user.save()
+        User.objects.filter(pk=request.user.pk).update(posts_count=F('posts_count') + 1)
 
-        serializer = PostSerializer(post, context={'request': request})
+        for attachment_form in attachment_forms:
+            attachment = attachment_form.save(commit=False)
+            attachment.created_by = request.user
+            # 尺寸只需读取文件头，上传时即可返回；主色调和占位串由后台处理补上
+            attachment.width, attachment.height = read_dimensions(attachment_form.cleaned_data['image'])
+            attachments.append(attachment)
+
+        # 所有附件一条 INSERT，多对多关系再一条 INSERT；图片文件在 bulk_create 中照常保存到存储
+        PostAttachment.objects.bulk_create(attachments)
+        add_post_attachments(post, attachments)
+
+    # 各尺寸图片交给后台进程池生成
+    enqueue_attachment_processing(attachments)
+
+    sync_hashtags(post)
+    fan_out_post(post)
+
+    # posts_count 是在数据库中加的，返回的作者信息要重新读取
+    request.user.refresh_from_db(fields=['posts_count'])
+    serializer = PostSerializer(post, context={'request': request})
+
+    return JsonResponse(serializer.data, safe=False)
 
-        return JsonResponse(serializer.data, safe=False)
-    else:
-        print(f"帖子表单验证失败: {form.errors}")
-        return JsonResponse({'error': form.errors}, status=400)
-    
 
 @api_view(['POST'])
 def post_like(request, pk):
     post = Post.objects.get(pk=pk)
 
-    if not post.likes.filter(created_by=request.user):
-        like = Like.objects.create(created_by=request.user)
-
-        post = Post.objects.get(pk=pk)
-        post.likes_count = post.likes_count + 1
-        post.likes.add(like)
-        post.save()
+    liked = toggle_like(PostLike, post, request.user)
 
+    if liked:
         notification = create_notification(request, 'post_like', post_id=post.id)
 
-        serializer = PostSerializer(post, context={'request': request})
-        return JsonResponse(serializer.data, safe=False)
-    else:
-        # 如果已经点赞，则取消点赞
-        like = post.likes.filter(created_by=request.user).first()
-        if like:
-            post.likes.remove(like)
-            post.likes_count = post.likes_count - 1
-            post.save()
-            like.delete()
-
-        serializer = PostSerializer(post, context={'request': request})
-        return JsonResponse(serializer.data, safe=False)
+    context = {'request': request, 'liked_post_ids': {post.id} if liked else set()}
+    serializer = PostSerializer(post, context=context)
+    return JsonResponse(serializer.data, safe=False)
 
 
 @api_view(['POST'])
 def post_create_comment(request, pk):
-    comment = Comment.objects.create(body=request.data.get('body'), created_by=request.user)
-
     post = Post.objects.get(pk=pk)
-    post.comments.add(comment)
-    post.comments_count = post.comments_count + 1
-    post.save()
+
+    with transaction.atomic():
+        comment = Comment.objects.create(post=post, body=request.data.get('body'), created_by=request.user)
+        Post.objects.filter(pk=post.pk).update(comments_count=F('comments_count') + 1)
 
     notification = create_notification(request, 'post_comment', post_id=post.id)
 
@@ -231,7 +512,10 @@ def post_create_comment(request, pk):
 @api_view(['DELETE'])
 def post_delete(request, pk):
     post = Post.objects.filter(created_by=request.user).get(pk=pk)
-    post.delete()
+    # 时间线条目随帖子级联删除
+    with transaction.atomic():
+        post.delete()
+        User.objects.filter(pk=request.user.pk).update(posts_count=Greatest(F('posts_count') - 1, 0))
 
     return JsonResponse({'message': 'post deleted'})
 
@@ -261,7 +545,6 @@ def post_report(request, pk):
             )
             # 添加到报告用户列表（保持向后兼容）
             post.reported_by_users.add(request.user)
-            post.save()
             message = '举报已提交'
             
             # 可以在这里添加通知管理员的代码
@@ -287,28 +570,14 @@ def comment_like(request, pk, comment_id):
     except Comment.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    # 检查用户是否已对评论点赞
-    like_exists = comment.likes.filter(created_by=request.user).exists()
+    liked = toggle_like(CommentLike, comment, request.user)
 
-    if not like_exists:
-        # 创建点赞
-        like = Like.objects.create(created_by=request.user)
-        comment.likes.add(like)
-        comment.likes_count += 1
-        comment.save()
-        
+    if liked:
         # 可选：创建通知
         create_notification(request, 'comment_like', comment_id=comment.id)
-    else:
-        # 取消点赞
-        like = comment.likes.filter(created_by=request.user).first()
-        if like:
-            comment.likes.remove(like)
-            comment.likes_count -= 1
-            comment.save()
-            like.delete()
 
-    serializer = CommentSerializer(comment, context={'request': request})
+    context = {'request': request, 'liked_comment_ids': {comment.id} if liked else set()}
+    serializer = CommentSerializer(comment, context=context)
     return Response(serializer.data)
 
 
@@ -323,8 +592,12 @@ def post_update(request, pk):
         
         # 更新帖子可见性
         if is_private is not None:
+            was_private = post.is_private
             post.is_private = is_private
-            post.save()
+            post.save(update_fields=['is_private'])
+
+            if post.is_private != was_private:
+                sync_post_visibility(post)
         
         # 返回更新后的帖子数据
         serializer = PostSerializer(post, context={'request': request})
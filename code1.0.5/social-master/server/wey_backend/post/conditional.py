@@ -0,0 +1,30 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def fingerprint(*parts):
+    """把若干廉价的校验值拼成 ETag，不需要序列化整个响应"""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def conditional_get(etag_func):
+    """
+    为 GET 接口加上 ETag 校验，客户端带 If-None-Match 且内容未变时直接返回 304
+
+    响应都是按用户生成的，因此标记为 private 并要求客户端每次重新校验
+    """
+    def decorator(func):
+        conditional_func = condition(etag_func=etag_func)(func)
+
+        @wraps(func)
+        def inner(request, *args, **kwargs):
+            response = conditional_func(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return inner
+
+    return decorator
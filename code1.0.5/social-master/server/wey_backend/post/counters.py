@@ -0,0 +1,136 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from account.utils import shared_cache_configured
+
+from .models import Post
+
+
+# 写回缓冲：点赞/取消点赞只在缓存里累加增量，由 scripts/flush_like_counters.py 定期批量写回数据库
+# 缓冲需要多个进程共享同一个缓存（Redis、Memcached 等）；进程内缓存下写回脚本看不到 worker 的增量，
+# 此时即使开启 LIKE_WRITE_BEHIND 也直接更新数据库
+DIRTY_SET_KEY = 'like_delta_dirty'
+DIRTY_LOCK_KEY = 'like_delta_dirty_lock'
+
+# 增量加上这个偏置后再存：Memcached 的 decr 最小减到 0，直接存负数会丢失取消点赞
+DELTA_BIAS = 2 ** 31
+
+
+def like_write_behind_enabled():
+    return settings.LIKE_WRITE_BEHIND and shared_cache_configured()
+
+
+def _delta_key(post_id):
+    return f'like_delta_{post_id}'
+
+
+def _pending_key(post_id):
+    return f'like_delta_pending_{post_id}'
+
+
+def _update_dirty_set(func):
+    """在短暂的缓存锁内读改写待写回的帖子ID集合"""
+    for _ in range(50):
+        if cache.add(DIRTY_LOCK_KEY, 1, 5):
+            try:
+                dirty = cache.get(DIRTY_SET_KEY) or set()
+                result = func(dirty)
+                cache.set(DIRTY_SET_KEY, dirty, None)
+                return result
+            finally:
+                cache.delete(DIRTY_LOCK_KEY)
+        time.sleep(0.01)
+
+    raise RuntimeError('无法获取点赞缓冲锁')
+
+
+def buffer_like_delta(post_id, delta):
+    """累加一个帖子的点赞增量；同一帖子在两次写回之间只登记一次"""
+    key = _delta_key(post_id)
+    cache.add(key, DELTA_BIAS, None)
+
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # add 与 incr 之间键被淘汰：重新写入带增量的值，并发写入抢先时再累加一次，仍然失败就直接更新数据库
+        if not cache.add(key, DELTA_BIAS + delta, None):
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                Post.objects.filter(pk=post_id).update(likes_count=F('likes_count') + delta)
+                return
+
+    if cache.add(_pending_key(post_id), 1, None):
+        try:
+            _update_dirty_set(lambda dirty: dirty.add(post_id))
+        except RuntimeError:
+            # 登记失败时撤掉标记，增量仍保留在缓存中，下一次点赞会重新登记
+            cache.delete(_pending_key(post_id))
+
+
+def get_pending_like_deltas(post_ids):
+    """批量读取尚未写回的点赞增量 {帖子ID: 增量}，只包含非零项"""
+    if not like_write_behind_enabled() or not post_ids:
+        return {}
+
+    keys = {_delta_key(post_id): post_id for post_id in post_ids}
+    return {keys[key]: value - DELTA_BIAS for key, value in cache.get_many(keys).items() if value != DELTA_BIAS}
+
+
+def _take_deltas(post_ids):
+    """取走增量：先清除登记标记再读取，期间新到的增量会重新登记，不会丢失"""
+    cache.delete_many([_pending_key(post_id) for post_id in post_ids])
+
+    deltas = {}
+    for post_id in post_ids:
+        value = cache.get(_delta_key(post_id))
+        delta = 0 if value is None else value - DELTA_BIAS
+        if delta:
+            cache.decr(_delta_key(post_id), delta)
+            deltas[post_id] = delta
+    return deltas
+
+
+def _restore_deltas(deltas):
+    for post_id, delta in deltas.items():
+        buffer_like_delta(post_id, delta)
+
+
+def flush_like_deltas(batch_size=None):
+    """把缓冲的增量写回数据库，每批一条 UPDATE ... CASE 语句，返回写回的帖子数"""
+    batch_size = batch_size or settings.LIKE_WRITE_BEHIND_BATCH_SIZE
+
+    def drain(dirty):
+        post_ids = list(dirty)
+        dirty.clear()
+        return post_ids
+
+    post_ids = _update_dirty_set(drain)
+    flushed = 0
+
+    for start in range(0, len(post_ids), batch_size):
+        deltas = _take_deltas(post_ids[start:start + batch_size])
+        if not deltas:
+            continue
+
+        try:
+            with transaction.atomic():
+                Post.objects.filter(pk__in=deltas.keys()).update(
+                    likes_count=F('likes_count') + Case(
+                        *[When(pk=post_id, then=Value(delta)) for post_id, delta in deltas.items()],
+                        default=Value(0),
+                        output_field=IntegerField()
+                    )
+                )
+        except Exception:
+            # 写回失败时把增量放回缓冲，等待下一次写回
+            _restore_deltas(deltas)
+            raise
+
+        flushed += len(deltas)
+
+    return flushed
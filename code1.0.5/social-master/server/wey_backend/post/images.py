@@ -0,0 +1,285 @@
+import io
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from wey_backend.storage import release_file
+
+
+logger = logging.getLogger(__name__)
+
+# 图片处理进程池，第一次提交任务时创建
+_executor = None
+
+# EXIF 中这几种拍摄方向需要把宽高对调
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS)
+    return _executor
+
+
+def read_dimensions(file):
+    """只读取文件头得到按拍摄方向转正后的宽高，不解码像素"""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+    file.seek(0)
+    return width, height
+
+
+def _open_normalized(source_path):
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, x_components=4, y_components=3):
+    """
+    计算图片的 BlurHash 占位串（https://blurha.sh）
+
+    先缩小到 32x32 再计算，客户端可以在原图下载完成前解码出模糊的预览
+    """
+    small = image.convert('RGB').resize((32, 32), Image.BILINEAR)
+    width, height = small.size
+    linear = [_srgb_to_linear(value) for value in range(256)]
+    data = small.tobytes()
+    pixels = [(linear[data[i]], linear[data[i + 1]], linear[data[i + 2]]) for i in range(0, len(data), 3)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                basis_y = math.cos(math.pi * j * y / height)
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * basis_y
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(channel) for factor in ac for channel in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    def quantise(value):
+        return max(0, min(18, int(math.floor(math.copysign(abs(value / max_value) ** 0.5, value) * 9 + 9.5))))
+
+    for r, g, b in ac:
+        result += _encode83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+
+    return result
+
+
+def dominant_color(image):
+    """把缩小后的图片量化为少量颜色，返回出现最多的颜色 #rrggbb"""
+    small = image.convert('RGB').resize((64, 64), Image.BILINEAR)
+    quantized = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def describe_image(image):
+    """客户端排版和占位所需的元数据"""
+    width, height = image.size
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': dominant_color(image),
+        'blurhash': blurhash(image),
+    }
+
+
+def read_metadata(source_path):
+    """在工作进程中执行：只计算元数据，不生成各尺寸图片"""
+    return describe_image(_open_normalized(source_path))
+
+
+def render_variants(source_path, sizes, image_format, quality):
+    """
+    在工作进程中执行：把原图缩放为各个尺寸并重新编码，同时计算元数据
+
+    sizes 为 {名称: 最长边像素}，返回 ({名称: 编码后的字节}, 元数据)；
+    重新编码时不写入 EXIF、ICC 等元数据，拍摄方向先按 EXIF 转正
+    """
+    image = _open_normalized(source_path)
+    rendered = {}
+
+    for name, size in sizes.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        variant.info = {}
+
+        output = io.BytesIO()
+        variant.save(output, format=image_format, quality=quality, method=4)
+        rendered[name] = output.getvalue()
+
+    return rendered, describe_image(image)
+
+
+def variant_path(name):
+    # 默认存储按内容哈希命名，同一原图生成的各尺寸图片只保存一份
+    extension = settings.POST_IMAGE_FORMAT.lower()
+    return f'post_attachments/variants/{name}.{extension}'
+
+
+def store_metadata(attachment_id, metadata):
+    from .models import PostAttachment
+
+    PostAttachment.objects.filter(pk=attachment_id).update(**metadata)
+
+
+def store_variants(attachment_id, rendered, metadata):
+    """
+    保存生成的图片和元数据，重新处理时先删除旧的文件
+
+    原图相同的附件共用同一组各尺寸图片，一并更新
+    """
+    from .models import PostAttachment
+
+    attachment = PostAttachment.objects.filter(pk=attachment_id).only('image', 'variants').first()
+    if attachment is None:
+        return
+
+    # 小图的各个尺寸可能完全相同，同样的内容只保存一次，不算作复用已有文件
+    saved = {}
+    variants = {}
+    for name, data in rendered.items():
+        if data not in saved:
+            saved[data] = default_storage.save(variant_path(name), ContentFile(data))
+        variants[name] = saved[data]
+
+    for name in set(attachment.variants.values()) - set(variants.values()):
+        release_file(name)
+
+    PostAttachment.objects.filter(image=attachment.image.name).update(variants=variants, **metadata)
+
+
+def process_attachment(attachment_id, image_name):
+    """在当前进程中同步处理一个附件，供脚本和关闭进程池时使用"""
+    rendered, metadata = render_variants(
+        default_storage.path(image_name),
+        settings.POST_IMAGE_VARIANTS,
+        settings.POST_IMAGE_FORMAT,
+        settings.POST_IMAGE_QUALITY
+    )
+    store_variants(attachment_id, rendered, metadata)
+
+
+def _on_rendered(attachment_id, future):
+    # 在进程池的回调线程中执行，用完后关闭这个线程的数据库连接
+    try:
+        store_variants(attachment_id, *future.result())
+    except Exception:
+        logger.exception('处理附件图片失败: %s', attachment_id)
+    finally:
+        connection.close()
+
+
+def _reuse_processed(jobs):
+    """
+    同一原图（内容寻址存储下文件名相同）已经处理过时，直接沿用已有的各尺寸图片和元数据
+
+    一次查询找出已处理的原图，一条 UPDATE 写回，返回仍需处理的任务
+    """
+    from .models import PostAttachment
+
+    fields = ('variants', 'width', 'height', 'dominant_color', 'blurhash')
+    processed = {}
+    rows = (
+        PostAttachment.objects
+        .filter(image__in={image_name for _, image_name in jobs})
+        .exclude(pk__in=[attachment_id for attachment_id, _ in jobs])
+        .exclude(variants={})
+        .values('image', *fields)
+    )
+    for row in rows:
+        processed.setdefault(row.pop('image'), row)
+
+    reused = [
+        PostAttachment(pk=attachment_id, **processed[image_name])
+        for attachment_id, image_name in jobs if image_name in processed
+    ]
+    if reused:
+        PostAttachment.objects.bulk_update(reused, fields)
+
+    return [(attachment_id, image_name) for attachment_id, image_name in jobs if image_name not in processed]
+
+
+def _submit(jobs):
+    jobs = _reuse_processed(jobs)
+
+    if not settings.IMAGE_PROCESSING_WORKERS:
+        for attachment_id, image_name in jobs:
+            try:
+                process_attachment(attachment_id, image_name)
+            except Exception:
+                logger.exception('处理附件图片失败: %s', attachment_id)
+        return
+
+    executor = _get_executor()
+
+    for attachment_id, image_name in jobs:
+        future = executor.submit(
+            render_variants,
+            default_storage.path(image_name),
+            settings.POST_IMAGE_VARIANTS,
+            settings.POST_IMAGE_FORMAT,
+            settings.POST_IMAGE_QUALITY
+        )
+        future.add_done_callback(partial(_on_rendered, attachment_id))
+
+
+def enqueue_attachment_processing(attachments):
+    """事务提交后把附件交给进程池生成各尺寸图片，请求线程只负责保存原图"""
+    jobs = [(attachment.id, attachment.image.name) for attachment in attachments if attachment.image]
+
+    if jobs:
+        transaction.on_commit(partial(_submit, jobs))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 19:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0016_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostHashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(db_index=True, max_length=255)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtags', to='post.post')),
+            ],
+            options={
+                'unique_together': {('post', 'tag')},
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2 on 2026-10-17 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def copy_likes(apps, schema_editor):
+    """把 Like + 多对多中间表里的点赞迁移为 PostLike / CommentLike 行，沿用原来的ID和时间"""
+    Post = apps.get_model('post', 'Post')
+    Comment = apps.get_model('post', 'Comment')
+    PostLike = apps.get_model('post', 'PostLike')
+    CommentLike = apps.get_model('post', 'CommentLike')
+
+    post_rows = Post.likes.through.objects.values_list(
+        'post_id', 'like_id', 'like__created_by_id', 'like__created_at'
+    )
+    PostLike.objects.bulk_create(
+        [
+            PostLike(id=like_id, post_id=post_id, created_by_id=user_id, created_at=created_at)
+            for post_id, like_id, user_id, created_at in post_rows.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+    comment_rows = Comment.likes.through.objects.values_list(
+        'comment_id', 'like_id', 'like__created_by_id', 'like__created_at'
+    )
+    CommentLike.objects.bulk_create(
+        [
+            CommentLike(id=like_id, comment_id=comment_id, created_by_id=user_id, created_at=created_at)
+            for comment_id, like_id, user_id, created_at in comment_rows.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('post', '0017_posthashtag'),
+    ]
+
+    operations = [
+        # 旧的 likes 多对多字段还在，先用临时的反向名称建表，拷贝完数据再改回 likes
+        migrations.CreateModel(
+            name='PostLike',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_likes', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='post.post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CommentLike',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='post.comment')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postlike',
+            constraint=models.UniqueConstraint(fields=('post', 'created_by'), name='unique_post_like'),
+        ),
+        migrations.AddConstraint(
+            model_name='commentlike',
+            constraint=models.UniqueConstraint(fields=('comment', 'created_by'), name='unique_comment_like'),
+        ),
+        migrations.RunPython(copy_likes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='comment',
+            name='likes',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='likes',
+        ),
+        migrations.DeleteModel(
+            name='Like',
+        ),
+        migrations.AlterField(
+            model_name='postlike',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='post.post'),
+        ),
+        migrations.AlterField(
+            model_name='commentlike',
+            name='comment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='post.comment'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0018_postlike_commentlike'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='postlike_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 19:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_comment_posts(apps, schema_editor):
+    """用一条 UPDATE 把多对多中间表里的帖子ID写入评论的 post 外键"""
+    Post = apps.get_model('post', 'Post')
+    Comment = apps.get_model('post', 'Comment')
+
+    through = Post.comments.through.objects.filter(comment_id=OuterRef('pk')).values('post_id')[:1]
+    Comment.objects.update(post_id=Subquery(through))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0019_postlike_user_created_idx'),
+    ]
+
+    operations = [
+        # 旧的 comments 多对多字段还在，先用临时的反向名称加外键，拷贝完数据再改回 comments
+        migrations.AddField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='post.post'),
+        ),
+        migrations.RunPython(copy_comment_posts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='post',
+            name='comments',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='post.post'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ),
+    ]
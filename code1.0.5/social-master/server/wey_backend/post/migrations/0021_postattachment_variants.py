@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0020_comment_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postattachment',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
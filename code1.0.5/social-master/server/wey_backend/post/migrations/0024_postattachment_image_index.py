@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0023_timelineentry_owner_created_post_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postattachment',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='post_attachments'),
+        ),
+    ]
@@ -1,44 +1,73 @@
 import uuid
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
 from django.utils.timesince import timesince
 
 from account.models import User
-
-
-class Like(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    created_by = models.ForeignKey(User, related_name='likes', on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+from wey_backend.resize import resized_media_url
 
 
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # 迁移前已经脱离帖子的历史评论没有所属帖子
+    post = models.ForeignKey('Post', related_name='comments', on_delete=models.CASCADE, null=True, blank=True)
     body = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
-    likes = models.ManyToManyField(Like, blank=True)
     likes_count = models.IntegerField(default=0)
 
     class Meta:
         ordering = ('created_at',)
+        # 评论列表按 (created_at, id) 正序分页
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
     
     def created_at_formatted(self):
        return timesince(self.created_at)
 
 
+class CommentLike(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    comment = models.ForeignKey(Comment, related_name='likes', on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, related_name='comment_likes', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'created_by'], name='unique_comment_like'),
+        ]
+
+
 class PostAttachment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    image = models.ImageField(upload_to='post_attachments', null=True, blank=True)
+    # 释放文件时按文件名检查引用（见 wey_backend.storage.is_file_referenced），需要索引
+    image = models.ImageField(upload_to='post_attachments', null=True, blank=True, db_index=True)
+    # 后台生成的各尺寸图片 {名称: 存储路径}，处理完成前为空
+    variants = models.JSONField(default=dict, blank=True)
+    # 按拍摄方向转正后的尺寸、主色调和 BlurHash 占位串，客户端据此在图片下载前完成排版
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True, default='')
+    blurhash = models.CharField(max_length=64, blank=True, default='')
     created_by = models.ForeignKey(User, related_name='post_attachments', on_delete=models.CASCADE)
 
     def get_image(self):
+        # 返回按 POST_IMAGE_DISPLAY_SIZE 缩放后的地址，后台生成的各尺寸图片见 get_variants
         if self.image:
-            return settings.WEBSITE_URL + self.image.url
+            return resized_media_url(self.image.name, *settings.POST_IMAGE_DISPLAY_SIZE)
         else:
             return ''
 
+    def get_variants(self):
+        """各尺寸图片的地址，尚未处理完成时返回空字典，客户端使用原图"""
+        return {
+            name: settings.WEBSITE_URL + default_storage.url(path)
+            for name, path in self.variants.items()
+        }
+
 
 class Post(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -48,10 +77,8 @@ class Post(models.Model):
 
     is_private = models.BooleanField(default=False)
 
-    likes = models.ManyToManyField(Like, blank=True)
     likes_count = models.IntegerField(default=0)
 
-    comments = models.ManyToManyField(Comment, blank=True)
     comments_count = models.IntegerField(default=0)
 
     reported_by_users = models.ManyToManyField(User, blank=True)
@@ -61,11 +88,55 @@ class Post(models.Model):
 
     class Meta:
         ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_at_id_idx'),
+        ]
     
     def created_at_formatted(self):
        return timesince(self.created_at)
+
+
+class PostLike(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    post = models.ForeignKey(Post, related_name='likes', on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, related_name='post_likes', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # 同一用户对同一帖子只能有一条点赞，点赞切换直接依赖这个约束
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'created_by'], name='unique_post_like'),
+        ]
+        # 按点赞时间分页读取某个用户点赞过的帖子
+        indexes = [
+            models.Index(fields=['created_by', '-created_at', '-id'], name='postlike_user_created_idx'),
+        ]
     
 
+class PostHashtag(models.Model):
+    post = models.ForeignKey(Post, related_name='hashtags', on_delete=models.CASCADE)
+    # 统一存为小写，按话题筛选时走索引而不是扫描帖子正文
+    tag = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        unique_together = ('post', 'tag')
+
+
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(User, related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    # 冗余帖子的发布时间，读取时间线只需按 owner 做一次索引范围扫描
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-created_at',)
+        unique_together = ('owner', 'post')
+        # 时间线按 (created_at, post_id) 游标分页，索引包含全部排序键，取一页不需要额外排序
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_created_idx'),
+        ]
+
+
 class Trend(models.Model):
     hashtag = models.CharField(max_length=255)
     occurences = models.IntegerField()
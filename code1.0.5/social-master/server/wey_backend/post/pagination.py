@@ -0,0 +1,106 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """把排序键编码为不透明的游标字符串"""
+    payload = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回排序键列表"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+
+    return values
+
+
+def get_page_size(request):
+    """读取 page_size 参数，限制在配置的最大值以内"""
+    try:
+        page_size = int(request.GET.get('page_size', settings.FEED_PAGE_SIZE))
+    except (TypeError, ValueError):
+        page_size = settings.FEED_PAGE_SIZE
+
+    return max(1, min(page_size, settings.FEED_MAX_PAGE_SIZE))
+
+
+def wants_cursor_page(request):
+    """只有显式传入游标或分页大小时才返回分页结构，保持旧客户端的列表格式"""
+    return 'cursor' in request.GET or 'page_size' in request.GET
+
+
+def paginate_by_cursor(queryset, request, fields=('created_at', 'id'), descending=True):
+    """
+    基于 (created_at, id) 的键集分页
+
+    返回 (当前页对象列表, next_cursor)，没有下一页时 next_cursor 为 None
+    """
+    page_size = get_page_size(request)
+    time_field, id_field = fields
+    prefix = '-' if descending else ''
+
+    queryset = queryset.order_by(prefix + time_field, prefix + id_field)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise InvalidCursor(cursor)
+
+        created_at = parse_datetime(values[0])
+        if created_at is None:
+            raise InvalidCursor(cursor)
+
+        lookup = 'lt' if descending else 'gt'
+        try:
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__{lookup}': created_at}) |
+                Q(**{time_field: created_at, f'{id_field}__{lookup}': values[1]})
+            )
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+    return split_page(list(queryset[:page_size + 1]), page_size, fields)
+
+
+def split_page(items, page_size, fields=('created_at', 'id')):
+    """
+    从多取一条的结果中切出当前页
+
+    items 已按排序键排好序、最多 page_size + 1 条，多出的一条说明还有下一页
+    """
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    last = items[-1]
+    time_field, id_field = fields
+
+    return items, encode_cursor([
+        _resolve(last, time_field).isoformat(),
+        _resolve(last, id_field),
+    ])
+
+
+def _resolve(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
@@ -0,0 +1,122 @@
+import math
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Post
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, get_page_size
+
+
+def trend_score(likes_count, comments_count, hours_old):
+    """与 scripts/generate_trends.py 相同的热度公式：点赞 + 2倍评论，按小时衰减"""
+    base_score = 1 + likes_count + (comments_count * 2)
+    hours_old = max(1, hours_old)
+    time_decay = 1 / (1 + hours_old / 24)
+
+    return base_score * time_decay
+
+
+def author_affinity(user, author_ids):
+    """统计用户与每个作者的互动次数（点赞 + 评论），两次聚合查询"""
+    affinity = dict.fromkeys(author_ids, 0)
+
+    for lookup in ('likes__created_by', 'comments__created_by'):
+        interactions = Post.objects.filter(
+            created_by_id__in=author_ids,
+            **{lookup: user}
+        ).values('created_by_id').annotate(count=Count('id'))
+
+        for row in interactions:
+            affinity[row['created_by_id']] += row['count']
+
+    # 自己的帖子不计亲密度
+    affinity.pop(user.id, None)
+    return affinity
+
+
+def rank_posts(posts, user, now=None):
+    """
+    对候选帖子打分排序，返回按得分降序排列的 [(得分, 发布时间, 帖子ID)]
+
+    候选集限定为最近 FEED_RANKED_WINDOW_DAYS 天内、最多 FEED_RANKED_MAX_CANDIDATES 条，
+    打分只用一次取值查询加两次亲密度聚合，不逐条查询帖子
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.FEED_RANKED_WINDOW_DAYS)
+
+    candidates = list(
+        posts.filter(created_at__gte=since, created_at__lte=now)
+        .order_by('-created_at')
+        .values_list('id', 'created_by_id', 'likes_count', 'comments_count', 'created_at')
+        [:settings.FEED_RANKED_MAX_CANDIDATES]
+    )
+
+    affinity = author_affinity(user, {author_id for _, author_id, _, _, _ in candidates})
+    weight = settings.FEED_RANKED_AFFINITY_WEIGHT
+
+    scored = [
+        (
+            trend_score(likes_count, comments_count, (now - created_at).total_seconds() / 3600)
+            * (1 + weight * math.log1p(affinity.get(author_id, 0))),
+            created_at,
+            post_id,
+        )
+        for post_id, author_id, likes_count, comments_count, created_at in candidates
+    ]
+    scored.sort(reverse=True)
+
+    return scored
+
+
+def _decode_ranked_cursor(cursor):
+    """游标为 [排序时间, 得分, 发布时间, 帖子ID]，返回 (排序时间, 上一页最后一条的排序键)"""
+    values = decode_cursor(cursor)
+    if len(values) != 4:
+        raise InvalidCursor(cursor)
+
+    now, created_at = parse_datetime(values[0]), parse_datetime(values[2])
+    try:
+        score = float(values[1])
+        post_id = uuid.UUID(values[3])
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+    if now is None or created_at is None or not math.isfinite(score):
+        raise InvalidCursor(cursor)
+    return now, (score, created_at, post_id)
+
+
+def paginate_ranked(posts, request):
+    """
+    按得分做键集分页，游标里记录第一页的排序时间和上一页最后一条的 (得分, 发布时间, ID)
+
+    后面的页按同一时间重新打分，时间衰减和候选集与第一页一致，之后发布的帖子不会插进来；
+    只取排在游标之后的帖子，翻页期间点赞、评论数变化也不会像偏移量那样整体错位而重复或漏掉
+
+    返回 (当前页帖子列表, next_cursor)
+    """
+    page_size = get_page_size(request)
+    now, after = timezone.now(), None
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        now, after = _decode_ranked_cursor(cursor)
+
+    ranked = rank_posts(posts, request.user, now)
+    if after is not None:
+        ranked = [entry for entry in ranked if entry < after]
+
+    page_entries = ranked[:page_size]
+    posts_by_id = Post.objects.in_bulk([post_id for _, _, post_id in page_entries])
+    page = [posts_by_id[post_id] for _, _, post_id in page_entries if post_id in posts_by_id]
+
+    next_cursor = None
+    if len(ranked) > page_size:
+        score, created_at, post_id = page_entries[-1]
+        next_cursor = encode_cursor([now.isoformat(), repr(score), created_at.isoformat(), post_id])
+
+    return page, next_cursor
@@ -1,62 +1,76 @@
 from rest_framework import serializers
 
-from account.serializers import UserSerializer
+from account.serializers import SparseFieldsMixin, UserSerializer
 
+from .counters import get_pending_like_deltas
 from .models import Post, PostAttachment, Comment, Trend, PostReport
 
 
-class PostAttachmentSerializer(serializers.ModelSerializer):
+class PostAttachmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PostAttachment
-        fields = ('id', 'get_image',)
+        fields = ('id', 'get_image', 'get_variants', 'width', 'height', 'dominant_color', 'blurhash',)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class LikeStateMixin:
+    """优先使用 like_context 预先批量解析好的点赞集合，没有时逐条查询"""
+    liked_ids_key = None
+
+    def get_islike(self, obj):
+        liked_ids = self.context.get(self.liked_ids_key)
+        if liked_ids is not None:
+            return obj.id in liked_ids
+
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return obj.likes.filter(created_by=request.user).exists()
+        return False
+
+
+class BufferedLikesCountMixin:
+    """点赞数加上写回缓冲中尚未落库的增量，优先使用 like_context 批量读取的结果"""
+
+    def get_likes_count(self, obj):
+        pending = self.context.get('pending_like_deltas')
+        if pending is None:
+            pending = get_pending_like_deltas([obj.id])
+        return obj.likes_count + pending.get(obj.id, 0)
+
+
+class PostSerializer(SparseFieldsMixin, LikeStateMixin, BufferedLikesCountMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     attachments = PostAttachmentSerializer(read_only=True, many=True)
+    likes_count = serializers.SerializerMethodField()
     islike = serializers.SerializerMethodField()
+    liked_ids_key = 'liked_post_ids'
 
     class Meta:
         model = Post
         fields = ('id', 'body', 'is_private', 'likes_count', 'comments_count', 'created_by', 'created_at', 'created_at_formatted', 'attachments', 'islike')
-    
-    def get_islike(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(created_by=request.user).exists()
-        return False
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, LikeStateMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     islike = serializers.SerializerMethodField()
+    liked_ids_key = 'liked_comment_ids'
 
     class Meta:
         model = Comment
         fields = ('id', 'body', 'created_by', 'created_at_formatted', 'likes_count', 'islike')
-    
-    def get_islike(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(created_by=request.user).exists()
-        return False
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(SparseFieldsMixin, LikeStateMixin, BufferedLikesCountMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
-    comments = CommentSerializer(read_only=True, many=True)
+    # 由 prefetch_post_relations 预取，post_detail 中只包含前几条预览评论
+    comments = CommentSerializer(source='preview_comments', read_only=True, many=True)
     attachments = PostAttachmentSerializer(read_only=True, many=True)
+    likes_count = serializers.SerializerMethodField()
     islike = serializers.SerializerMethodField()
+    liked_ids_key = 'liked_post_ids'
 
     class Meta:
         model = Post
         fields = ('id', 'body', 'likes_count', 'comments_count', 'created_by', 'created_at', 'created_at_formatted', 'comments', 'attachments', 'islike')
-    
-    def get_islike(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(created_by=request.user).exists()
-        return False
 
 
 class TrendSerializer(serializers.ModelSerializer):
@@ -65,7 +79,7 @@ class TrendSerializer(serializers.ModelSerializer):
         fields = ('id', 'hashtag', 'occurences',)
 
 
-class PostReportSerializer(serializers.ModelSerializer):
+class PostReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     reported_by = UserSerializer(read_only=True)
     post = PostSerializer(read_only=True)
 
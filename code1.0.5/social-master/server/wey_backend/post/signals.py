@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from wey_backend.storage import release_file
+
+from .models import Post, PostAttachment
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_attachments(sender, instance, **kwargs):
+    # 多对多关系在删除帖子时会被清掉，先记下附件ID
+    instance._attachment_ids = list(instance.attachments.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def delete_detached_attachments(sender, instance, **kwargs):
+    """删除帖子后，不再属于任何帖子的附件随之删除"""
+    attachment_ids = getattr(instance, '_attachment_ids', None)
+
+    if attachment_ids:
+        PostAttachment.objects.filter(id__in=attachment_ids, post__isnull=True).delete()
+
+
+def _release_attachment_files(image_name, variants):
+    # 各尺寸图片由原图内容决定，同一原图的附件共用同一组文件
+    if image_name and PostAttachment.objects.filter(image=image_name).exists():
+        return
+
+    for name in variants.values():
+        release_file(name)
+
+    release_file(image_name)
+
+
+@receiver(post_delete, sender=PostAttachment)
+def release_attachment_files(sender, instance, **kwargs):
+    """事务提交后释放附件的文件，仍被其他记录引用的文件会保留"""
+    image_name = instance.image.name if instance.image else None
+    variants = dict(instance.variants)
+
+    transaction.on_commit(lambda: _release_attachment_files(image_name, variants))
@@ -1,3 +1,646 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from account.models import FriendshipRequest, User
+from account.serializers import is_field_requested, parse_fields
+from wey_backend.storage import RELEASE_GRACE_PERIOD, ContentAddressedStorage, release_file, sweep_deferred_releases
+
+from .counters import buffer_like_delta, flush_like_deltas, get_pending_like_deltas, like_write_behind_enabled
+from .models import Comment, CommentLike, Post, PostAttachment, PostLike, TimelineEntry
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_by_cursor, split_page
+from .utils import parse_id_list, toggle_like
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        created_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        post_id = uuid.uuid4()
+
+        cursor = encode_cursor([created_at.isoformat(), post_id])
+
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), [created_at.isoformat(), str(post_id)])
+
+    def test_rejects_malformed_cursors(self):
+        for cursor in ('not a cursor!', '@@@@', encode_cursor([]).replace('W', '{'), 'eyJhIjoxfQ'):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_rejects_cursors_with_bad_values(self):
+        # 长度不对、时间无法解析、ID 不是 UUID 都视为无效游标，在查询数据库之前抛出
+        cursors = (
+            encode_cursor(['2024-05-01T12:30:00+00:00']),
+            encode_cursor(['yesterday', uuid.uuid4()]),
+            encode_cursor(['2024-05-01T12:30:00+00:00', 'not-a-uuid']),
+        )
+
+        for cursor in cursors:
+            request = RequestFactory().get('/api/posts/', {'cursor': cursor})
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginate_by_cursor(Post.objects.all(), request)
+
+    def test_split_page(self):
+        created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        items = [SimpleNamespace(created_at=created_at, id=index) for index in range(3)]
+
+        self.assertEqual(split_page(items, 3), (items, None))
+
+        page, next_cursor = split_page(items, 2)
+        self.assertEqual(page, items[:2])
+        self.assertEqual(decode_cursor(next_cursor), [created_at.isoformat(), '1'])
+
+
+class FeedCursorTests(TestCase):
+    def setUp(self):
+        self.viewer = create_user('viewer')
+        self.friend = create_user('friend')
+        self.viewer.friends.add(self.friend)
+        self.client = client_for(self.viewer)
+
+        created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        self.visible = []
+        for index in range(5):
+            post = Post.objects.create(body=f'post {index}', created_by=self.viewer if index % 2 else self.friend)
+            self.visible.append(post)
+        Post.objects.create(body='private', created_by=self.friend, is_private=True)
+        # 两条帖子发布时间相同，靠 ID 区分先后
+        Post.objects.filter(pk__in=[self.visible[1].pk, self.visible[2].pk]).update(created_at=created_at)
+
+    def test_pages_cover_the_feed_once(self):
+        expected = [str(post.pk) for post in Post.objects.filter(pk__in=[post.pk for post in self.visible])
+                    .order_by('-created_at', '-id')]
+        seen = []
+        params = {'page_size': 2}
+
+        while True:
+            data = self.client.get('/api/posts/', params).json()
+            seen += [post['id'] for post in data['posts']]
+            if data['next_cursor'] is None:
+                break
+            params['cursor'] = data['next_cursor']
+
+        self.assertEqual(seen, expected)
+
+    def test_old_clients_get_a_plain_list(self):
+        self.assertEqual(len(self.client.get('/api/posts/').json()), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/posts/', {'cursor': 'not a cursor!'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': '无效的游标'})
+
+
+@override_settings(FEED_USE_TIMELINE=True)
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.viewer = create_user('viewer')
+        self.friend = create_user('friend')
+        self.viewer.friends.add(self.friend)
+        self.client = client_for(self.viewer)
+
+    def feed_ids(self, client=None):
+        return [post['id'] for post in (client or self.client).get('/api/posts/').json()]
+
+    def create_post(self, user, body, is_private=False):
+        response = client_for(user).post('/api/posts/create/', {'body': body, 'is_private': is_private})
+        return response.json()['id']
+
+    def test_new_posts_fan_out_to_friends(self):
+        public = self.create_post(self.friend, 'public')
+        private = self.create_post(self.friend, 'private', is_private=True)
+        own = self.create_post(self.viewer, 'mine', is_private=True)
+
+        self.assertEqual(self.feed_ids(), [own, public])
+        self.assertEqual(self.feed_ids(client_for(self.friend)), [private, public])
+
+    def test_visibility_changes_follow_the_post(self):
+        post_id = self.create_post(self.friend, 'public')
+        friend_client = client_for(self.friend)
+
+        friend_client.put(f'/api/posts/{post_id}/update/', {'is_private': True}, format='json')
+        self.assertEqual(self.feed_ids(), [])
+
+        friend_client.put(f'/api/posts/{post_id}/update/', {'is_private': False}, format='json')
+        self.assertEqual(self.feed_ids(), [post_id])
+
+    def test_new_friendship_backfills_and_removal_prunes(self):
+        stranger = create_user('stranger')
+        public = self.create_post(stranger, 'public')
+        self.create_post(stranger, 'private', is_private=True)
+        FriendshipRequest.objects.create(created_for=self.viewer, created_by=stranger)
+
+        self.client.post(f'/api/friends/{stranger.pk}/{FriendshipRequest.ACCEPTED}/')
+        self.assertEqual(self.feed_ids(), [public])
+
+        self.client.post(f'/api/friends/{stranger.pk}/remove/')
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.filter(owner=stranger, post__created_by=self.viewer).exists())
+
+    def test_timeline_pages_with_cursor(self):
+        post_ids = [self.create_post(self.friend, f'post {index}') for index in range(3)]
+
+        first = self.client.get('/api/posts/', {'page_size': 2}).json()
+        second = self.client.get('/api/posts/', {'page_size': 2, 'cursor': first['next_cursor']}).json()
+
+        self.assertEqual([post['id'] for post in first['posts'] + second['posts']], post_ids[::-1])
+        self.assertIsNone(second['next_cursor'])
+
+
+def create_user(name):
+    return User.objects.create_user(name=name, email=f'{name}@example.com', password='password')
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.viewer = create_user('viewer')
+        self.author.friends.add(self.viewer)
+        self.post = Post.objects.create(body='hello', created_by=self.author)
+        self.attachment = PostAttachment.objects.create(image='post_attachments/a.jpg', created_by=self.author)
+        self.post.attachments.add(self.attachment)
+        Comment.objects.create(post=self.post, body='first', created_by=self.viewer)
+        self.client = client_for(self.viewer)
+        self.urls = ['/api/posts/', f'/api/posts/{self.post.pk}/', f'/api/posts/profile/{self.author.pk}/']
+
+    def assertChangedBy(self, mutate, urls=None):
+        etags = {url: self.client.get(url)['ETag'] for url in urls or self.urls}
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+        mutate()
+
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+    def test_attachment_processing_invalidates(self):
+        self.assertChangedBy(lambda: PostAttachment.objects.filter(pk=self.attachment.pk).update(blurhash='LEHV6nWB'))
+
+    def test_body_edit_invalidates(self):
+        self.assertChangedBy(lambda: Post.objects.filter(pk=self.post.pk).update(body='edited'))
+
+    def test_author_profile_change_invalidates(self):
+        self.assertChangedBy(lambda: User.objects.filter(pk=self.author.pk).update(name='renamed'))
+
+    def test_commenter_profile_change_invalidates_detail(self):
+        self.assertChangedBy(
+            lambda: User.objects.filter(pk=self.viewer.pk).update(name='renamed'),
+            urls=[f'/api/posts/{self.post.pk}/']
+        )
+
+    def test_like_invalidates(self):
+        self.assertChangedBy(lambda: self.client.post(f'/api/posts/{self.post.pk}/like/'))
+
+
+class LikeWriteBehindTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.author = create_user('author')
+        self.post = Post.objects.create(body='hello', created_by=self.author)
+
+    def shared_cache(self):
+        return override_settings(LIKE_WRITE_BEHIND=True, CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.cache_dir}
+        })
+
+    def test_disabled_without_shared_cache(self):
+        with override_settings(LIKE_WRITE_BEHIND=True):
+            self.assertFalse(like_write_behind_enabled())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                client_for(self.author).post(f'/api/posts/{self.post.pk}/like/')
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_buffered_deltas_are_flushed(self):
+        fans = [create_user(f'fan{index}') for index in range(3)]
+
+        with self.shared_cache():
+            for fan in fans:
+                with self.captureOnCommitCallbacks(execute=True):
+                    client_for(fan).post(f'/api/posts/{self.post.pk}/like/')
+            with self.captureOnCommitCallbacks(execute=True):
+                client_for(fans[0]).post(f'/api/posts/{self.post.pk}/like/')
+
+            self.assertEqual(get_pending_like_deltas([self.post.pk]), {self.post.pk: 2})
+            self.assertEqual(flush_like_deltas(), 1)
+            self.assertEqual(get_pending_like_deltas([self.post.pk]), {})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+
+    def test_negative_deltas_survive(self):
+        with self.shared_cache():
+            buffer_like_delta(self.post.pk, -2)
+            self.assertEqual(get_pending_like_deltas([self.post.pk]), {self.post.pk: -2})
+
+    def test_evicted_key_falls_back_to_database(self):
+        with self.shared_cache(), mock.patch.object(cache, 'incr', side_effect=ValueError), \
+                mock.patch.object(cache, 'add', return_value=False):
+            buffer_like_delta(self.post.pk, 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, True)
+        self.storage = ContentAddressedStorage(location=location)
+        self.author = create_user('author')
+
+    def expire(self, name):
+        expired = time.time() - RELEASE_GRACE_PERIOD - 1
+        os.utime(self.storage.path(name), (expired, expired))
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('post_attachments/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('post_attachments/b.JPG', ContentFile(b'same'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('post_attachments/'))
+        self.assertTrue(first.endswith('.jpg'))
+
+    def test_release_keeps_referenced_files(self):
+        name = self.storage.save('post_attachments/a.jpg', ContentFile(b'image'))
+        attachment = PostAttachment.objects.create(image=name, created_by=self.author)
+
+        self.assertFalse(release_file(name, self.storage))
+        self.assertTrue(self.storage.exists(name))
+
+        attachment.delete()
+        self.assertTrue(release_file(name, self.storage))
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reused_file_is_deferred_then_swept(self):
+        name = self.storage.save('post_attachments/a.jpg', ContentFile(b'image'))
+        self.storage.save('post_attachments/b.jpg', ContentFile(b'image'))
+
+        # 刚被复用的文件在宽限期内不删除，记入推迟列表
+        self.assertFalse(release_file(name, self.storage))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(sweep_deferred_releases(self.storage), 0)
+        self.assertTrue(self.storage.exists(name))
+
+        self.expire(name)
+        self.assertEqual(sweep_deferred_releases(self.storage), 1)
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(sweep_deferred_releases(self.storage), 0)
+
+    def test_sweep_skips_files_referenced_again(self):
+        name = self.storage.save('post_attachments/a.jpg', ContentFile(b'image'))
+        self.storage.save('post_attachments/b.jpg', ContentFile(b'image'))
+        release_file(name, self.storage)
+        PostAttachment.objects.create(image=name, created_by=self.author)
+
+        self.expire(name)
+        self.assertEqual(sweep_deferred_releases(self.storage), 0)
+        self.assertTrue(self.storage.exists(name))
+
+
+class PostCounterTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.client = client_for(self.author)
+
+    def test_create_returns_updated_posts_count(self):
+        response = self.client.post('/api/posts/create/', {'body': 'hello'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created_by']['posts_count'], 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.posts_count, 1)
+
+    def test_delete_decrements_posts_count(self):
+        post_id = self.client.post('/api/posts/create/', {'body': 'hello'}).json()['id']
+        self.client.delete(f'/api/posts/{post_id}/delete/')
+
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.posts_count, 0)
+
+
+class ResizedMediaTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, MEDIA_RESIZE_CACHE_DIR=os.path.join(media_root, 'cache'),
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        os.makedirs(os.path.join(media_root, 'post_attachments'))
+        with open(os.path.join(media_root, 'post_attachments', 'a.png'), 'wb') as image_file:
+            Image.new('RGB', (400, 300), 'red').save(image_file, format='PNG')
+        with open(os.path.join(media_root, 'post_attachments', 'broken.png'), 'wb') as broken_file:
+            broken_file.write(b'not an image')
+
+        self.url = '/media/resized/96x96/post_attachments/a.png'
+
+    def test_resizes_and_answers_conditional_requests(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, (96, 72))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_range_requests(self):
+        content = self.client.get(self.url).content
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, content[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(content)}')
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=-5').content, content[-5:])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(content)}-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_rejects_unlisted_sizes_and_paths(self):
+        self.assertEqual(self.client.get('/media/resized/97x97/post_attachments/a.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/resized/96x96/post_attachments/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/resized/96x96/post_attachments/../../a.png').status_code, 404)
+
+    def test_undecodable_images_are_unsupported(self):
+        self.assertEqual(self.client.get('/media/resized/96x96/post_attachments/broken.png').status_code, 415)
+
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertEqual(self.client.get(self.url).status_code, 415)
+
+
+class RankedFeedTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.client = client_for(self.author)
+        self.posts = [Post.objects.create(body=f'post {index}', created_by=self.author) for index in range(5)]
+        for index, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(likes_count=index * 10)
+
+    def page(self, cursor=None):
+        params = {'mode': 'ranked', 'page_size': 2}
+        if cursor:
+            params['cursor'] = cursor
+        data = self.client.get('/api/posts/', params).json()
+        return [post['id'] for post in data['posts']], data['next_cursor']
+
+    def test_pages_follow_score(self):
+        seen, cursor = self.page()
+        while cursor:
+            ids, cursor = self.page(cursor)
+            seen += ids
+
+        self.assertEqual(seen, [str(post.pk) for post in reversed(self.posts)])
+
+    def test_score_changes_between_pages_do_not_repeat_posts(self):
+        first, cursor = self.page()
+        # 第二页的帖子被顶到第一页之前：按偏移量翻页时第一页的最后一条会在第二页重复出现
+        Post.objects.filter(pk=self.posts[2].pk).update(likes_count=1000)
+        Post.objects.create(body='new', created_by=self.author)
+
+        second, cursor = self.page(cursor)
+
+        self.assertEqual(second, [str(self.posts[1].pk), str(self.posts[0].pk)])
+        self.assertIsNone(cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_rejects_malformed_cursors(self):
+        for values in ([5], ['now', '1.0', '2024-05-01T00:00:00+00:00', uuid.uuid4()],
+                       ['2024-05-01T00:00:00+00:00', 'nan', '2024-05-01T00:00:00+00:00', uuid.uuid4()]):
+            response = self.client.get('/api/posts/', {'mode': 'ranked', 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+
+
+class FieldSelectionTests(TestCase):
+    def test_parse_fields(self):
+        self.assertIsNone(parse_fields(''))
+        self.assertIsNone(parse_fields(None))
+        self.assertIsNone(parse_fields(' , '))
+        self.assertEqual(
+            parse_fields('id, body,created_by.name,created_by.get_avatar'),
+            {'id': None, 'body': None, 'created_by': {'name': None, 'get_avatar': None}}
+        )
+
+    def test_full_field_is_not_narrowed(self):
+        self.assertEqual(parse_fields('created_by,created_by.name'), {'created_by': None})
+
+    def test_is_field_requested(self):
+        selection = parse_fields('id,created_by.name')
+
+        self.assertTrue(is_field_requested(None, 'attachments'))
+        self.assertTrue(is_field_requested(selection, 'id'))
+        self.assertTrue(is_field_requested(selection, 'created_by'))
+        self.assertTrue(is_field_requested(selection, 'created_by', 'name'))
+        self.assertFalse(is_field_requested(selection, 'created_by', 'get_avatar'))
+        self.assertFalse(is_field_requested(selection, 'attachments'))
+        self.assertTrue(is_field_requested(parse_fields('comments'), 'comments', 'islike'))
+
+    def test_api_returns_only_requested_fields(self):
+        author = create_user('author')
+        post = Post.objects.create(body='hello', created_by=author)
+        Comment.objects.create(post=post, body='first', created_by=author)
+        client = client_for(author)
+
+        data = client.get('/api/posts/', {'fields': 'id,created_by.name'}).json()
+        self.assertEqual(data, [{'id': str(post.pk), 'created_by': {'name': 'author'}}])
+
+        data = client.get(f'/api/posts/{post.pk}/', {'fields': 'id,comments.body'}).json()
+        self.assertEqual(data['post'], {'id': str(post.pk), 'comments': [{'body': 'first'}]})
+
+    def test_unknown_fields_are_ignored(self):
+        author = create_user('author')
+        Post.objects.create(body='hello', created_by=author)
+
+        data = client_for(author).get('/api/posts/', {'fields': 'id,password,created_by.email_token'}).json()
+        self.assertEqual(data[0], {'id': data[0]['id'], 'created_by': {}})
+
+
+class LikeToggleTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.fan = create_user('fan')
+        self.post = Post.objects.create(body='hello', created_by=self.author)
+        self.comment = Comment.objects.create(post=self.post, body='first', created_by=self.author)
+        self.client = client_for(self.fan)
+
+    def test_post_like_toggles(self):
+        url = f'/api/posts/{self.post.pk}/like/'
+
+        data = self.client.post(url).json()
+        self.assertEqual((data['likes_count'], data['islike']), (1, True))
+        self.assertTrue(PostLike.objects.filter(post=self.post, created_by=self.fan).exists())
+
+        data = self.client.post(url).json()
+        self.assertEqual((data['likes_count'], data['islike']), (0, False))
+        self.assertFalse(PostLike.objects.exists())
+
+    def test_comment_like_toggles(self):
+        url = f'/api/posts/{self.post.pk}/comments/{self.comment.pk}/like/'
+
+        data = self.client.post(url).json()
+        self.assertEqual((data['likes_count'], data['islike']), (1, True))
+
+        self.client.post(url)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 0)
+        self.assertFalse(CommentLike.objects.exists())
+
+    def test_likes_are_unique_per_user(self):
+        PostLike.objects.create(post=self.post, created_by=self.fan)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PostLike.objects.create(post=self.post, created_by=self.fan)
+
+        CommentLike.objects.create(comment=self.comment, created_by=self.fan)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CommentLike.objects.create(comment=self.comment, created_by=self.fan)
+
+    def test_concurrent_duplicate_like_does_not_count_twice(self):
+        # 另一个请求已经插入了同一条点赞：唯一约束拦截插入，计数器不变
+        with mock.patch.object(PostLike.objects, 'create', side_effect=IntegrityError):
+            self.assertTrue(toggle_like(PostLike, self.post, self.fan))
+
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_feed_reports_like_state(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.author.friends.add(self.fan)
+
+        data = self.client.get('/api/posts/').json()
+        self.assertEqual([(post['likes_count'], post['islike']) for post in data], [(1, True)])
+        data = client_for(self.author).get('/api/posts/').json()
+        self.assertEqual([(post['likes_count'], post['islike']) for post in data], [(1, False)])
+
+
+class ParseIdListTests(SimpleTestCase):
+    def test_accepts_lists_and_comma_separated_strings(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+
+        self.assertEqual(parse_id_list([str(first), second], 10), [first, second])
+        self.assertEqual(parse_id_list(f' {first} ,,{second},', 10), [first, second])
+        self.assertEqual(parse_id_list(None, 10), [])
+        self.assertEqual(parse_id_list('', 10), [])
+
+    def test_keeps_order_and_removes_duplicates(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+
+        self.assertEqual(parse_id_list([second, first, str(second).upper()], 10), [second, first])
+
+    def test_limit(self):
+        ids = [uuid.uuid4() for _ in range(3)]
+
+        self.assertEqual(parse_id_list(ids + ids, 3), ids)
+        self.assertEqual(parse_id_list(ids), ids)
+        with self.assertRaises(ValueError):
+            parse_id_list(ids, 2)
+
+    def test_rejects_malformed_values(self):
+        # JSON 对象不能按键当作ID列表
+        for values in (['not-a-uuid'], 5, {str(uuid.uuid4()): 1}, {uuid.uuid4()}):
+            with self.subTest(values=values), self.assertRaises(ValueError):
+                parse_id_list(values, 10)
+
+
+class PostStateTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.viewer = create_user('viewer')
+        self.post = Post.objects.create(body='hello', created_by=self.author, likes_count=3, comments_count=1)
+        self.hidden = Post.objects.create(body='secret', created_by=self.author, is_private=True)
+        self.comment = Comment.objects.create(post=self.post, body='first', created_by=self.author, likes_count=1)
+        CommentLike.objects.create(comment=self.comment, created_by=self.viewer)
+        self.client = client_for(self.viewer)
+
+    def test_returns_visible_state_in_constant_queries(self):
+        payload = {
+            'post_ids': [str(self.post.pk), str(self.hidden.pk), str(uuid.uuid4())],
+            'comment_ids': [str(self.comment.pk)],
+        }
+
+        with self.assertNumQueries(4):
+            response = self.client.post('/api/posts/state/', payload, format='json')
+
+        self.assertEqual(response.json(), {
+            'posts': {str(self.post.pk): {'likes_count': 3, 'comments_count': 1, 'islike': False}},
+            'comments': {str(self.comment.pk): {'likes_count': 1, 'islike': True}},
+        })
+
+    def test_rejects_malformed_ids(self):
+        for payload in ({'post_ids': ['not-a-uuid']}, {'post_ids': {str(self.post.pk): True}}, {'comment_ids': 5}):
+            response = self.client.post('/api/posts/state/', payload, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+
+        with override_settings(POST_STATE_MAX_IDS=1):
+            payload = {'post_ids': [str(uuid.uuid4()), str(uuid.uuid4())]}
+            self.assertEqual(self.client.post('/api/posts/state/', payload, format='json').status_code, 400)
+
+
+def png_upload(name='photo.png', size=(8, 8), color='red'):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+class UploadLimitTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.author = create_user('author')
+        self.client = client_for(self.author)
+
+    def create(self, *images):
+        return self.client.post(
+            '/api/posts/create/', {'body': 'hello', 'attachments_count': len(images), 'image': list(images)}
+        )
+
+    def assertRejected(self, response, message):
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(message, response.json()['error'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_accepts_images_and_stores_identical_ones_once(self):
+        response = self.create(png_upload('a.png'), png_upload('b.png'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['attachments']), 2)
+        self.assertEqual(len({attachment.image.name for attachment in PostAttachment.objects.all()}), 1)
+
+    def test_rejects_non_images(self):
+        text = SimpleUploadedFile('notes.png', b'plain text', content_type='image/png')
+
+        self.assertRejected(self.create(text), 'notes.png 不是支持的图片格式')
+
+    @override_settings(UPLOAD_MAX_FILES=1)
+    def test_rejects_too_many_files(self):
+        self.assertRejected(self.create(png_upload('a.png'), png_upload('b.png')), '一次最多上传 1 个文件')
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=64)
+    def test_rejects_large_files(self):
+        self.assertRejected(self.create(png_upload(size=(64, 64))), '单个文件不能超过')
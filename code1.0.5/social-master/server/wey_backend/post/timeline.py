@@ -0,0 +1,98 @@
+from django.conf import settings
+
+from account.utils import get_friend_ids
+
+from .models import Post, TimelineEntry
+from .pagination import paginate_by_cursor, wants_cursor_page
+
+
+def timeline_enabled():
+    return settings.FEED_USE_TIMELINE
+
+
+def read_timeline(user, request):
+    """
+    按发布时间倒序读取用户的时间线，返回 (帖子列表, next_cursor)
+
+    先在 TimelineEntry 上沿 (owner, created_at, post_id) 索引取出这一页，再按ID取帖子，
+    不需要连接帖子表后再排序；游标与帖子表的 (created_at, id) 游标通用，请求不分页时返回整条时间线
+    """
+    entries = TimelineEntry.objects.filter(owner=user)
+
+    if wants_cursor_page(request):
+        entries, next_cursor = paginate_by_cursor(entries, request, fields=('created_at', 'post_id'))
+    else:
+        entries, next_cursor = list(entries.order_by('-created_at', '-post_id')), None
+
+    posts = Post.objects.in_bulk([entry.post_id for entry in entries])
+    return [posts[entry.post_id] for entry in entries if entry.post_id in posts], next_cursor
+
+
+def fan_out_post(post):
+    """把帖子写入作者本人以及（公开帖子时）所有好友的时间线"""
+    if not timeline_enabled():
+        return
+
+    owner_ids = [post.created_by_id]
+
+    if not post.is_private:
+        owner_ids.extend(get_friend_ids(post.created_by))
+
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=owner_id, post=post, created_at=post.created_at) for owner_id in owner_ids],
+        ignore_conflicts=True
+    )
+
+
+def retract_post(post):
+    """帖子设为私密后，从好友的时间线中移除，只保留作者本人"""
+    if not timeline_enabled():
+        return
+
+    TimelineEntry.objects.filter(post=post).exclude(owner_id=post.created_by_id).delete()
+
+
+def sync_post_visibility(post):
+    if post.is_private:
+        retract_post(post)
+    else:
+        fan_out_post(post)
+
+
+def backfill_friendship(user, friend):
+    """成为好友后，把双方已有的公开帖子补写进对方的时间线"""
+    if not timeline_enabled():
+        return
+
+    entries = []
+
+    for owner, author in ((user, friend), (friend, user)):
+        posts = Post.objects.filter(created_by=author, is_private=False).values_list('id', 'created_at')
+        entries.extend(
+            TimelineEntry(owner=owner, post_id=post_id, created_at=created_at)
+            for post_id, created_at in posts
+        )
+
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def prune_friendship(user, friend):
+    """解除好友关系后，从双方时间线中移除对方的帖子"""
+    if not timeline_enabled():
+        return
+
+    TimelineEntry.objects.filter(owner=user, post__created_by=friend).delete()
+    TimelineEntry.objects.filter(owner=friend, post__created_by=user).delete()
+
+
+def rebuild_timeline(user):
+    """按当前的好友关系和可见性规则重建某个用户的时间线"""
+    TimelineEntry.objects.filter(owner=user).delete()
+
+    friend_ids = get_friend_ids(user)
+    posts = Post.objects.filter(created_by=user) | Post.objects.filter(created_by_id__in=friend_ids, is_private=False)
+
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(owner=user, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts.values_list('id', 'created_at')
+    )
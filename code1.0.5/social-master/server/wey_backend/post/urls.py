@@ -9,6 +9,7 @@ urlpatterns = [
     path('<uuid:pk>/', api.post_detail, name='post_detail'),
     path('<uuid:pk>/like/', api.post_like, name='post_like'),
     path('<uuid:pk>/comment/', api.post_create_comment, name='post_create_comment'),
+    path('<uuid:pk>/comments/', api.post_comments, name='post_comments'),
     path('<uuid:pk>/comments/<uuid:comment_id>/like/', api.comment_like, name='comment_like'),
     path('<uuid:pk>/delete/', api.post_delete, name='post_delete'),
     path('<uuid:pk>/report/', api.post_report, name='post_report'),
@@ -16,6 +17,8 @@ urlpatterns = [
     path('profile/<uuid:id>/', api.post_list_profile, name='post_list_profile'),
     path('profile/<uuid:id>/likes/', api.post_list_liked, name='post_list_liked'),
     path('create/', api.post_create, name='post_create'),
+    path('state/', api.post_state, name='post_state'),
+    path('batch/', api.post_batch, name='post_batch'),
     path('trends/', api.get_trends, name='get_trends'),
     
     # 管理员API
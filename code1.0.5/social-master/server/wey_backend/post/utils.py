@@ -0,0 +1,207 @@
+import re
+import uuid
+
+from bs4 import BeautifulSoup
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+
+from account.serializers import is_field_requested, requested_fields
+
+from .counters import buffer_like_delta, get_pending_like_deltas, like_write_behind_enabled
+from .models import Comment, CommentLike, Post, PostHashtag, PostLike
+
+
+# 与 scripts/generate_trends.py 使用相同的话题匹配规则
+HASHTAG_PATTERN = re.compile(r'#([\w\d\u4e00-\u9fa5]+)')
+
+
+def plain_text(text):
+    """正文可能是富文本HTML，去掉标签只保留文字"""
+    if text and '<' in text and '>' in text:
+        return BeautifulSoup(text, 'html.parser').get_text(' ', strip=True)
+    return text or ''
+
+
+def extract_hashtags(text):
+    """提取正文中的话题标签（去重、小写），正文可能是富文本HTML"""
+    if not text:
+        return set()
+
+    return {match.lower()[:255] for match in HASHTAG_PATTERN.findall(plain_text(text))}
+
+
+def normalize_hashtag(tag):
+    return tag.strip().lstrip('#').lower()
+
+
+def sync_hashtags(post):
+    """按帖子当前正文重建话题索引"""
+    tags = extract_hashtags(post.body)
+    existing = set(post.hashtags.values_list('tag', flat=True))
+
+    if existing - tags:
+        post.hashtags.filter(tag__in=existing - tags).delete()
+
+    PostHashtag.objects.bulk_create(
+        [PostHashtag(post=post, tag=tag) for tag in tags - existing],
+        ignore_conflicts=True
+    )
+
+
+def parse_id_list(values, limit=None):
+    """
+    解析客户端传入的ID列表，支持列表或逗号分隔的字符串，保持顺序并去重
+
+    None 视为空列表；不是列表、元组或字符串（例如 JSON 对象或数字）、格式错误或数量超过 limit（None 表示不限）时抛出 ValueError
+    """
+    if values is None:
+        return []
+    if isinstance(values, str):
+        values = values.split(',')
+    elif not isinstance(values, (list, tuple)):
+        raise ValueError('ID列表须为数组或逗号分隔的字符串')
+
+    ids = []
+    for value in values:
+        value = str(value).strip()
+        if value:
+            ids.append(uuid.UUID(value))
+
+    ids = list(dict.fromkeys(ids))
+    if limit is not None and len(ids) > limit:
+        raise ValueError(f'最多支持 {limit} 个ID')
+
+    return ids
+
+
+def add_post_attachments(post, attachments):
+    """用一条 INSERT 写入帖子与附件的多对多关系，代替逐个 add"""
+    through = Post.attachments.through
+    through.objects.bulk_create(
+        [through(post_id=post.pk, postattachment_id=attachment.pk) for attachment in attachments],
+        ignore_conflicts=True
+    )
+
+
+def _author_lookup(fields, *path, prefix=None):
+    if not is_field_requested(fields, *path):
+        return None
+
+    prefix = prefix or '__'.join(path)
+    if is_field_requested(fields, *path, 'mbti_result'):
+        return prefix + '__mibt_results'
+    return prefix
+
+
+def prefetch_post_relations(posts, with_comments=False, fields=None, comments_limit=None):
+    """
+    批量预取一页帖子的作者、作者的MBTI结果和附件，查询次数与帖子数量无关
+
+    fields 为 ?fields= 解析出的字段选择，没有被请求的关联不会预取；
+    with_comments 时评论按时间正序预取到 post.preview_comments，
+    comments_limit 为每个帖子最多预取的评论数，None 表示全部
+    """
+    lookups = [_author_lookup(fields, 'created_by')]
+
+    if is_field_requested(fields, 'attachments'):
+        lookups.append('attachments')
+
+    if with_comments and is_field_requested(fields, 'comments'):
+        comments = Comment.objects.order_by('created_at', 'id')
+        if comments_limit is not None:
+            comments = comments[:comments_limit]
+
+        lookups.append(Prefetch('comments', queryset=comments, to_attr='preview_comments'))
+        lookups.append(_author_lookup(fields, 'comments', 'created_by', prefix='preview_comments__created_by'))
+
+    prefetch_related_objects(posts, *[lookup for lookup in lookups if lookup])
+    return posts
+
+
+def prefetch_comment_relations(comments, fields=None):
+    """批量预取一页评论的作者和作者的MBTI结果"""
+    lookup = _author_lookup(fields, 'created_by')
+
+    if lookup:
+        prefetch_related_objects(comments, lookup)
+    return comments
+
+
+def get_liked_post_ids(user, post_ids):
+    """一次查询出用户点赞过的帖子ID集合"""
+    return set(
+        PostLike.objects.filter(
+            post_id__in=post_ids,
+            created_by=user
+        ).values_list('post_id', flat=True)
+    )
+
+
+def get_liked_comment_ids(user, comment_ids):
+    """一次查询出用户点赞过的评论ID集合"""
+    return set(
+        CommentLike.objects.filter(
+            comment_id__in=comment_ids,
+            created_by=user
+        ).values_list('comment_id', flat=True)
+    )
+
+
+def toggle_like(like_model, target, user):
+    """
+    切换点赞状态：已点赞则删除，否则插入，计数器用 F() 表达式原子更新
+
+    并发的重复点赞由点赞表上的唯一约束拦截，返回切换后是否为已点赞
+    """
+    target_model = type(target)
+    target_field = target_model._meta.model_name
+
+    with transaction.atomic():
+        deleted, _ = like_model.objects.filter(**{target_field: target, 'created_by': user}).delete()
+
+        if deleted:
+            delta = -1
+        else:
+            try:
+                with transaction.atomic():
+                    like_model.objects.create(**{target_field: target, 'created_by': user})
+                delta = 1
+            except IntegrityError:
+                # 并发请求已经插入了同一条点赞，计数器由那个请求负责
+                delta = 0
+
+        if delta and target_model is Post and like_write_behind_enabled():
+            # 帖子点赞数先写入缓冲，由定时任务批量写回，热门帖子不再争抢同一行
+            transaction.on_commit(lambda: buffer_like_delta(target.pk, delta))
+        elif delta:
+            target_model.objects.filter(pk=target.pk).update(likes_count=F('likes_count') + delta)
+
+    target.refresh_from_db(fields=['likes_count'])
+    return not deleted
+
+
+def like_context(request, posts=None, comments=None, comments_path=('comments',)):
+    """
+    构造序列化器上下文，预先批量解析当前用户对这一页帖子和评论的点赞状态
+
+    序列化器的 get_islike 会优先读取这里的集合，避免每个对象单独查询一次；
+    没有传入的那一类对象不写入上下文，序列化器会退回逐条查询。
+    comments_path 为评论在 ?fields= 中的位置，直接序列化评论列表时传入 ()
+    """
+    user = getattr(request, 'user', None)
+    is_authenticated = user is not None and user.is_authenticated
+    fields = requested_fields(request)
+    context = {'request': request, 'fields': fields}
+
+    if posts is not None and is_field_requested(fields, 'islike'):
+        post_ids = [post.id for post in posts]
+        context['liked_post_ids'] = get_liked_post_ids(user, post_ids) if is_authenticated and post_ids else set()
+
+    if posts is not None and like_write_behind_enabled() and is_field_requested(fields, 'likes_count'):
+        context['pending_like_deltas'] = get_pending_like_deltas([post.id for post in posts])
+
+    if comments is not None and is_field_requested(fields, *comments_path, 'islike'):
+        comment_ids = [comment.id for comment in comments]
+        context['liked_comment_ids'] = get_liked_comment_ids(user, comment_ids) if is_authenticated and comment_ids else set()
+
+    return context
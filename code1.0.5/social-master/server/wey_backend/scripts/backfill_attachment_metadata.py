@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from post.images import read_metadata, store_metadata
+from post.models import PostAttachment
+
+# 为 media/post_attachments 中已有的附件补算宽高、主色调和 BlurHash，只处理缺少这些信息的附件，可重复执行
+attachments = PostAttachment.objects.exclude(image='').exclude(image__isnull=True).filter(blurhash='')
+updated = 0
+
+with ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS or None) as executor:
+    futures = {
+        executor.submit(read_metadata, default_storage.path(attachment.image.name)): attachment
+        for attachment in attachments.only('id', 'image')
+    }
+
+    for future in as_completed(futures):
+        attachment = futures[future]
+        try:
+            store_metadata(attachment.id, future.result())
+            updated += 1
+        except Exception as e:
+            print('处理失败:', attachment.id, attachment.image.name, e)
+
+print('附件元数据补算完成:', updated)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from post.models import Post
+from post.utils import sync_hashtags
+
+# 为已有帖子补建话题索引，可重复执行
+posts = Post.objects.only('id', 'body')
+
+for post in posts.iterator():
+    sync_hashtags(post)
+
+print('话题索引补建完成:', posts.count())
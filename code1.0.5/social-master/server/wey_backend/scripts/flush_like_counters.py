@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from post.counters import flush_like_deltas, like_write_behind_enabled
+
+# 把缓存中累加的点赞增量批量写回 Post.likes_count，开启 LIKE_WRITE_BEHIND 时由调度器每分钟执行
+if like_write_behind_enabled():
+    print('点赞数写回完成:', flush_like_deltas())
+else:
+    print('未开启 LIKE_WRITE_BEHIND，跳过')
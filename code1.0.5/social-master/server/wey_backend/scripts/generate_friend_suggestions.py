@@ -15,7 +15,7 @@ django.setup()
 
 
 from account.models import User
-from post.models import Post, Like, Comment
+from post.models import Post, Comment
 
 users = User.objects.all()
 
@@ -48,14 +48,12 @@ for user in users:
             friends_of_friends[post_author] += 2  # 点赞互动权重为2
     
     # 找出用户评论过的帖子的作者
-    user_commented_posts = Comment.objects.filter(created_by=user)
+    user_commented_posts = Comment.objects.filter(created_by=user, post__isnull=False).select_related('post__created_by')
     for comment in user_commented_posts:
-        # 找到包含此评论的帖子
-        commented_posts = Post.objects.filter(comments=comment)
-        for post in commented_posts:
-            post_author = post.created_by
-            if post_author not in user.friends.all() and post_author != user:
-                friends_of_friends[post_author] += 3  # 评论互动权重为3
+        # 评论直接关联所属帖子
+        post_author = comment.post.created_by
+        if post_author not in user.friends.all() and post_author != user:
+            friends_of_friends[post_author] += 3  # 评论互动权重为3
     
     # 将推荐好友按权重排序添加到推荐列表
     for suggested_friend, weight in friends_of_friends.most_common(10):
@@ -17,6 +17,7 @@ django.setup()
 
 
 from post.models import Post, Trend
+from post.ranking import trend_score
 
 def extract_hashtags(text, trends_dict):
     # 首先检查文本是否包含HTML标签
@@ -36,18 +37,14 @@ def extract_hashtags(text, trends_dict):
     return trends_dict
 
 def calculate_trend_score(post, hashtag, time_diff, user_usage_count):
-    # 基础热度计算
-    base_score = 1 + post.likes_count + (post.comments_count * 2)
-    
-    # 时间衰减 - 使用小时作为单位
-    hours_old = max(1, time_diff.total_seconds() / 3600)  # 转换为小时
-    time_decay = 1 / (1 + hours_old/24)  # 转换为天数
+    # 基础热度与时间衰减（与首页热度排序共用同一公式）
+    hours_old = time_diff.total_seconds() / 3600  # 转换为小时
     
     # 用户重复使用衰减
     usage_decay = 1 / user_usage_count
     
     # 最终得分
-    final_score = base_score * time_decay * usage_decay
+    final_score = trend_score(post.likes_count, post.comments_count, hours_old) * usage_decay
     
     return final_score
 
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from post.images import render_variants, store_variants
+from post.models import PostAttachment
+
+# 为还没有生成各尺寸图片的附件补做处理（例如上线前的历史附件、处理失败的附件）
+# 传入 --all 时重新处理所有附件，修改 POST_IMAGE_VARIANTS 后使用
+attachments = PostAttachment.objects.exclude(image='').exclude(image__isnull=True)
+
+if '--all' not in sys.argv:
+    attachments = attachments.filter(variants={})
+
+processed = 0
+
+with ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS or None) as executor:
+    futures = {
+        executor.submit(
+            render_variants,
+            default_storage.path(attachment.image.name),
+            settings.POST_IMAGE_VARIANTS,
+            settings.POST_IMAGE_FORMAT,
+            settings.POST_IMAGE_QUALITY
+        ): attachment
+        for attachment in attachments.only('id', 'image')
+    }
+
+    for future in as_completed(futures):
+        attachment = futures[future]
+        try:
+            store_variants(attachment.id, *future.result())
+            processed += 1
+        except Exception as e:
+            print('处理失败:', attachment.id, attachment.image.name, e)
+
+print('附件图片处理完成:', processed)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from django.db import transaction
+
+from search.index import rebuild_index
+
+# 清空并重建帖子和用户的检索索引（CJK n-gram 倒排表，以及 SQLite 上的 FTS5 表），可重复执行
+with transaction.atomic():
+    total = rebuild_index()
+
+print('检索索引重建完成:', total)
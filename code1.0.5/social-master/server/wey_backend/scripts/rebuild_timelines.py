@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from account.models import User
+from post.timeline import rebuild_timeline
+
+# 按当前好友关系重建所有用户的时间线，开启 FEED_USE_TIMELINE 前需要先执行一次
+for user in User.objects.all():
+    rebuild_timeline(user)
+    print('重建时间线:', user, user.timeline_entries.count())
+
+print('时间线重建完成')
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from django.db import transaction
+from django.db.models import Count
+
+from account.models import User
+from post.counters import flush_like_deltas, get_pending_like_deltas, like_write_behind_enabled
+from post.models import Comment, CommentLike, Post, PostLike
+
+# 用分组聚合重新计算所有冗余计数器，报告并修正偏差
+# 传入 --dry-run 时只报告，不写回数据库
+# 开启点赞写回缓冲时，缓存中尚未写回的增量也已经体现在点赞记录里，Post.likes_count 的期望值要扣掉这部分
+DRY_RUN = '--dry-run' in sys.argv
+
+
+def grouped_counts(queryset, group_field):
+    """一次分组查询得到 {分组键: 数量}"""
+    return dict(
+        queryset.values(group_field).annotate(total=Count('pk')).values_list(group_field, 'total')
+    )
+
+
+def reconcile(model, field, actual_counts, pending_func=None):
+    """
+    对比当前计数与实际数量，返回偏差列表 [(pk, 当前值, 应有值)]
+
+    pending_func 返回 {pk: 尚未写回的增量}，应有值为实际数量减去这部分
+    """
+    drifted = []
+
+    for pk, current in model.objects.values_list('pk', field).iterator():
+        actual = actual_counts.get(pk, 0)
+        if current != actual:
+            drifted.append((pk, current, actual))
+
+    # 只为有偏差的记录读取缓冲中的增量
+    if drifted and pending_func is not None:
+        pending = pending_func([pk for pk, _, _ in drifted])
+        drifted = [
+            (pk, current, actual - pending.get(pk, 0))
+            for pk, current, actual in drifted
+            if current != actual - pending.get(pk, 0)
+        ]
+
+    if drifted and not DRY_RUN:
+        model.objects.bulk_update(
+            [model(pk=pk, **{field: actual}) for pk, _, actual in drifted],
+            [field],
+            batch_size=500
+        )
+
+    return drifted
+
+
+COUNTERS = [
+    (Post, 'likes_count', lambda: grouped_counts(PostLike.objects.all(), 'post_id'), get_pending_like_deltas),
+    (Post, 'comments_count', lambda: grouped_counts(Comment.objects.all(), 'post_id'), None),
+    (Comment, 'likes_count', lambda: grouped_counts(CommentLike.objects.all(), 'comment_id'), None),
+    (User, 'posts_count', lambda: grouped_counts(Post.objects.all(), 'created_by_id'), None),
+    (User, 'friends_count', lambda: grouped_counts(User.friends.through.objects.all(), 'from_user_id'), None),
+]
+
+# 先把缓冲的增量写回，校正时剩下的只有这之后新到的少量增量
+if like_write_behind_enabled() and not DRY_RUN:
+    print('点赞数写回完成:', flush_like_deltas())
+
+total_drift = 0
+
+for model, field, count_func, pending_func in COUNTERS:
+    with transaction.atomic():
+        drifted = reconcile(model, field, count_func(), pending_func)
+
+    total_drift += len(drifted)
+    print(f'{model.__name__}.{field}: 偏差 {len(drifted)} 条')
+
+    for pk, current, actual in drifted[:20]:
+        print(f'  {pk}: {current} -> {actual}')
+
+    if len(drifted) > 20:
+        print(f'  ... 其余 {len(drifted) - 20} 条省略')
+
+if DRY_RUN:
+    print('计数器检查完成（未写入）:', total_drift)
+else:
+    print('计数器校正完成:', total_drift)
@@ -39,6 +39,22 @@ def run_generate_friend_suggestions():
     except Exception as e:
         logger.error(f"生成好友推荐任务失败: {e}")
 
+def run_flush_like_counters():
+    """执行点赞数写回的脚本"""
+    try:
+        script_path = os.path.join(current_dir, 'flush_like_counters.py')
+        subprocess.run([sys.executable, script_path], check=True)
+    except Exception as e:
+        logger.error(f"点赞数写回任务失败: {e}")
+
+def run_sweep_deferred_media():
+    """执行清理推迟释放的媒体文件的脚本"""
+    try:
+        script_path = os.path.join(current_dir, 'sweep_deferred_media.py')
+        subprocess.run([sys.executable, script_path], check=True)
+    except Exception as e:
+        logger.error(f"清理推迟释放的媒体文件失败: {e}")
+
 def setup_schedule():
     """设置定时任务计划"""
     # 每小时执行一次生成趋势标签
@@ -46,10 +62,18 @@ def setup_schedule():
     
     # 每天凌晨3点执行一次好友推荐
     schedule.every().day.at("03:00").do(run_generate_friend_suggestions)
+
+    # 每分钟写回一次缓冲的点赞数（未开启 LIKE_WRITE_BEHIND 时脚本直接跳过）
+    schedule.every(1).minutes.do(run_flush_like_counters)
+
+    # 每小时清理一次推迟释放的媒体文件
+    schedule.every(1).hours.do(run_sweep_deferred_media)
     
     logger.info("定时任务已设置")
     logger.info("- 生成趋势标签: 每小时执行一次")
     logger.info("- 生成好友推荐: 每天03:00执行")
+    logger.info("- 写回点赞数: 每分钟执行一次")
+    logger.info("- 清理推迟释放的媒体文件: 每小时执行一次")
 
 if __name__ == "__main__":
     setup_schedule()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+import django
+import os
+import sys
+
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wey_backend.settings")
+django.setup()
+
+
+from wey_backend.storage import sweep_deferred_releases
+
+# 释放时刚被复用、因而推迟删除的媒体文件，过了宽限期后重新检查引用，没有引用的删除
+print('推迟释放的文件清理完成:', sweep_deferred_releases())
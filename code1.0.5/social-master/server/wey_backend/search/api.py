@@ -1,4 +1,4 @@
-from django.db.models import Q
+from django.conf import settings
 from django.http import JsonResponse
 
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
@@ -6,9 +6,12 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
 from account.models import User
-from account.serializers import UserSerializer
-from post.models import Post
+from account.serializers import UserSerializer, requested_fields
+from account.utils import get_friend_ids
 from post.serializers import PostSerializer
+from post.utils import like_context, prefetch_post_relations
+
+from .index import search_posts, search_users
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -17,28 +20,46 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
+def _page_params(data, default_page_size=10):
+    """从请求体中读取 page 和 page_size，格式错误时使用默认值"""
+    try:
+        page = max(1, int(data.get('page', 1)))
+        page_size = min(StandardResultsSetPagination.max_page_size, max(1, int(data.get('page_size', default_page_size))))
+    except (ValueError, TypeError):
+        page, page_size = 1, default_page_size
+    return page, page_size
+
+
 @api_view(['POST'])
 def search(request):
     data = request.data
     query = data['query']
-    user_ids = [request.user.id]
+    user_ids = [request.user.id] + get_friend_ids(request.user)
 
-    for user in request.user.friends.all():
-        user_ids.append(user.id)
+    # 用户和帖子都按相关度排序，只返回第 page 页；*_has_more 表示是否还有下一页，
+    # *_count 为匹配的总数，含 CJK 的查询是不超过 COUNT_LIMIT 的估计值（见 NgramResults.count）
+    page, page_size = _page_params(data, settings.SEARCH_PAGE_SIZE)
+    start = (page - 1) * page_size
 
-    users = User.objects.filter(name__icontains=query)
-    users_serializer = UserSerializer(users, many=True)
+    users = search_users(query, User.objects.prefetch_related('mibt_results'))
+    users_page = list(users[start:start + page_size + 1])
+    users_serializer = UserSerializer(users_page[:page_size], many=True)
 
-    posts = Post.objects.filter(
-        Q(body__icontains=query, is_private=False) | 
-        Q(created_by_id__in=list(user_ids), body__icontains=query)
-    )
+    posts = search_posts(query, author_ids=user_ids)
+    posts_page = list(posts[start:start + page_size + 1])
+    posts_has_more = len(posts_page) > page_size
+    posts_page = prefetch_post_relations(posts_page[:page_size], fields=requested_fields(request))
 
-    posts_serializer = PostSerializer(posts, many=True)
+    posts_serializer = PostSerializer(posts_page, many=True, context=like_context(request, posts=posts_page))
 
     return JsonResponse({
         'users': users_serializer.data,
-        'posts': posts_serializer.data
+        'posts': posts_serializer.data,
+        'users_count': users.count(),
+        'posts_count': posts.count(),
+        'users_has_more': len(users_page) > page_size,
+        'posts_has_more': posts_has_more,
+        'page': page
     }, safe=False)
 
 @api_view(['POST'])
@@ -61,29 +82,29 @@ def search_posts_paginated(request):
     # 收集当前用户的id，用于搜索自己的私密帖子
     user_id = request.user.id
 
-    # 过滤出公开帖子或用户自己的私密帖子
-    posts = Post.objects.filter(
-        Q(body__icontains=query, is_private=False) | 
-        Q(created_by_id=user_id, body__icontains=query)
-    ).distinct().order_by('-created_at')  
+    # 公开帖子或用户自己的私密帖子，按相关度排序
+    posts = search_posts(query, author_ids=[user_id])
     
     # 关键修复：只修改 request._request.GET，不尝试设置 query_params
     from django.http.request import QueryDict
     query_params = QueryDict('', mutable=True)
     query_params['page'] = str(page)
     query_params['page_size'] = str(page_size)
+    if 'fields' in request.GET:
+        query_params['fields'] = request.GET['fields']
     
     # 只修改底层的 request.GET
     request._request.GET = query_params
     
     paginator = StandardResultsSetPagination()
-    result_page = paginator.paginate_queryset(posts, request)
+    result_page = prefetch_post_relations(paginator.paginate_queryset(posts, request), fields=requested_fields(request))
     
     # 额外调试，打印分页结果
         
-    posts_serializer = PostSerializer(result_page, many=True, context={'request': request})
+    posts_serializer = PostSerializer(result_page, many=True, context=like_context(request, posts=result_page))
     
     response = paginator.get_paginated_response(posts_serializer.data)
+    # 含 CJK 的查询为估计值，见 NgramResults.count
     response.data['total_count'] = posts.count()
     response.data['current_page'] = page  # 添加当前页码信息便于调试
     return response
\ No newline at end of file
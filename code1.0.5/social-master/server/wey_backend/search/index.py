@@ -0,0 +1,383 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from account.models import User
+from post.models import Post
+from post.utils import plain_text
+
+from .models import SearchDocument, SearchPosting
+from .ngrams import (
+    CJK_RUN_RE, TERM_BATCH_SIZE, batches, build_postings, candidate_documents, extract_terms, normalize, query_terms,
+    update_postings
+)
+
+
+# 每类记录一张 FTS5 表，rowid 为 SearchDocument.id，BM25 的词频统计也按类分开
+FTS_TABLES = {
+    SearchDocument.POST: 'search_post_fts',
+    SearchDocument.USER: 'search_user_fts',
+}
+
+# 各类记录参与检索的文本
+INDEXED_TEXT = {
+    SearchDocument.POST: lambda post: plain_text(post.body),
+    SearchDocument.USER: lambda user: user.name or '',
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+# n-gram 检索返回的结果数最多估计到这么多，计数不为此校验候选的文本
+COUNT_LIMIT = 1000
+
+_fts_enabled = None
+
+
+def fts_enabled():
+    """SQLite 且迁移时成功创建了 FTS5 表时使用 FTS5，否则使用后端自身的全文检索或 icontains"""
+    global _fts_enabled
+
+    if _fts_enabled is None:
+        _fts_enabled = (
+            connection.vendor == 'sqlite'
+            and set(FTS_TABLES.values()) <= set(connection.introspection.table_names())
+        )
+    return _fts_enabled
+
+
+def use_fts(query):
+    # unicode61 分词器把连续的 CJK 字符当作一个词，这类查询改用 n-gram 倒排表
+    return fts_enabled() and not CJK_RUN_RE.search(query or '')
+
+
+def fts_query(query):
+    """
+    把用户输入转为 FTS5 查询：每个词加引号避免被当作语法，词之间为 AND，最后一个词按前缀匹配
+
+    查询和索引的文本做同样的规范化（全角转半角、小写）；没有可检索的词时返回 None
+    """
+    tokens = TOKEN_RE.findall(normalize(query))
+    if not tokens:
+        return None
+
+    terms = ['"%s"' % token.replace('"', '""') for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def update_document(kind, instance):
+    """
+    帖子或用户新建、修改后更新索引
+
+    n-gram 倒排表只增删这个文档变化了的词项行；FTS5 表先删除旧的条目再写入新的文本
+    """
+    text = normalize(INDEXED_TEXT[kind](instance))
+
+    with transaction.atomic():
+        document, created = SearchDocument.objects.get_or_create(kind=kind, object_id=instance.pk, defaults={'text': text})
+        old_text = '' if created else document.text
+
+        if not created and old_text == text:
+            return
+
+        update_postings(kind, document.pk, extract_terms(old_text), extract_terms(text))
+        if not created:
+            document.text = text
+            document.save(update_fields=['text'])
+
+        if fts_enabled():
+            table = FTS_TABLES[kind]
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [document.pk])
+                cursor.execute(f'INSERT INTO {table} (rowid, text) VALUES (%s, %s)', [document.pk, text])
+
+
+def remove_document(kind, object_id):
+    """帖子或用户删除后移除索引条目"""
+    document = SearchDocument.objects.filter(kind=kind, object_id=object_id).first()
+    if document is None:
+        return
+
+    # 倒排行随文档级联删除
+    with transaction.atomic():
+        if fts_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLES[kind]} WHERE rowid = %s', [document.pk])
+        document.delete()
+
+
+def rebuild_index(batch_size=1000):
+    """清空并按现有的帖子和用户重建 n-gram 倒排表和 FTS5 表，返回写入的文档数"""
+    total = 0
+
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            for table in FTS_TABLES.values():
+                cursor.execute(f'DELETE FROM {table}')
+
+    for kind, model in ((SearchDocument.POST, Post), (SearchDocument.USER, User)):
+        batch = []
+
+        for instance in model.objects.all().iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) == batch_size:
+                total += _index_batch(kind, batch, batch_size)
+                batch = []
+        if batch:
+            total += _index_batch(kind, batch, batch_size)
+
+    return total
+
+
+def _index_batch(kind, instances, batch_size):
+    """写入一批文档、它们的倒排行和 FTS5 条目，返回写入的文档数"""
+    texts = {instance.pk: normalize(INDEXED_TEXT[kind](instance)) for instance in instances}
+    documents = SearchDocument.objects.bulk_create(
+        [SearchDocument(kind=kind, object_id=object_id, text=text) for object_id, text in texts.items()]
+    )
+    document_ids = {document.object_id: document.pk for document in documents}
+
+    # 较老的 SQLite（3.35 以前）不支持 RETURNING，bulk_create 不会回填自增主键，按 object_id 重新取一次
+    if None in document_ids.values():
+        document_ids = dict(
+            SearchDocument.objects
+            .filter(kind=kind, object_id__in=list(document_ids))
+            .values_list('object_id', 'id')
+        )
+
+    indexed = [(document_ids[object_id], text) for object_id, text in texts.items()]
+
+    SearchPosting.objects.bulk_create(build_postings(kind, indexed), batch_size=batch_size)
+
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {FTS_TABLES[kind]} (rowid, text) VALUES (%s, %s)', indexed)
+    return len(indexed)
+
+
+class NgramResults:
+    """
+    n-gram 倒排表检索结果的惰性序列，按 ordering 字段排序
+
+    倒排表求交只能得到候选，还要确认文本确实包含整个查询串。切片时先分批只取候选的ID和排序字段排好序，
+    再按顺序在数据库中校验文本，凑够这一页为止；校验和取记录都只涉及这一页之前的候选，不会把候选的文本全部取出
+    """
+
+    def __init__(self, queryset, kind, document_ids, phrase, ordering):
+        self.queryset = queryset
+        self.kind = kind
+        self.document_ids = sorted(document_ids)
+        self.phrase = phrase
+        self.ordering = ordering
+        self._ordered = None
+        self._position = 0
+        self._matched = []
+
+    def _ordered_candidates(self):
+        """queryset 范围内的候选 [(主键, 文档ID)]，按 ordering 排序"""
+        if self._ordered is None:
+            field = self.ordering.lstrip('-')
+            rows = []
+
+            for batch in batches(self.document_ids):
+                documents = dict(SearchDocument.objects.filter(pk__in=batch).values_list('object_id', 'id'))
+                rows.extend(
+                    (value is not None, value, pk, documents[pk])
+                    for pk, value in self.queryset.filter(pk__in=list(documents)).values_list('pk', field)
+                )
+
+            rows.sort(reverse=self.ordering.startswith('-'))
+            self._ordered = [(pk, document_id) for _, _, pk, document_id in rows]
+        return self._ordered
+
+    def _collect(self, stop=None):
+        """按顺序校验候选的文本，直到确认了 stop 条结果（None 表示全部），返回确认过的主键"""
+        ordered = self._ordered_candidates()
+
+        while self._position < len(ordered) and (stop is None or len(self._matched) < stop):
+            chunk = ordered[self._position:self._position + TERM_BATCH_SIZE]
+            self._position += len(chunk)
+            verified = set(
+                SearchDocument.objects
+                .filter(pk__in=[document_id for _, document_id in chunk], text__contains=self.phrase)
+                .values_list('id', flat=True)
+            )
+            self._matched.extend(pk for pk, document_id in chunk if document_id in verified)
+
+        return self._matched
+
+    def count(self):
+        """
+        近似的结果数：已确认的结果加上还没有校验的候选，最多 COUNT_LIMIT
+
+        只用切片时已经校验过的部分，不为计数校验剩下的候选；候选不一定都能通过校验，所以这是偏大的估计，
+        全部候选都校验过时才是准确值
+        """
+        remaining = len(self._ordered_candidates()) - self._position
+        return min(len(self._matched) + remaining, COUNT_LIMIT)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+
+        object_ids = self._collect(key.stop)[key.start or 0:key.stop]
+        instances = {instance.pk: instance for instance in self.queryset.filter(pk__in=object_ids)}
+        return [instances[object_id] for object_id in object_ids if object_id in instances]
+
+
+def ngram_search(kind, query, queryset, ordering):
+    """
+    用 n-gram 倒排表检索包含查询串的记录，返回 NgramResults
+
+    查询中没有至少两个相连的 CJK 字符时无法使用索引，返回 None
+    """
+    normalized = normalize(query).strip()
+    terms = query_terms(normalized)
+    if not terms:
+        return None
+
+    return NgramResults(queryset, kind, candidate_documents(kind, terms), normalized, ordering)
+
+
+class RankedResults:
+    """
+    FTS5 检索结果的惰性序列，按 BM25 得分排序
+
+    支持 count() 和切片，可以直接交给 Django 的分页器；切片时只查询这一页的ID，再取出对应的记录
+    """
+
+    def __init__(self, queryset, table, match, joins='', where='', params=()):
+        self.queryset = queryset
+        self.table = table
+        self.match = match
+        self.joins = joins
+        self.where = where
+        self.params = list(params)
+        self._count = None
+
+    def _from_where(self):
+        sql = (
+            f'FROM {self.table} '
+            f'JOIN search_searchdocument d ON d.id = {self.table}.rowid '
+            f'{self.joins} '
+            f'WHERE {self.table} MATCH %s {self.where}'
+        )
+        return sql, [self.match] + self.params
+
+    def count(self):
+        if self._count is None:
+            sql, params = self._from_where()
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) {sql}', params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+
+        start = key.start or 0
+        limit = -1 if key.stop is None else max(0, key.stop - start)
+        sql, params = self._from_where()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.object_id {sql} ORDER BY bm25({self.table}) LIMIT %s OFFSET %s',
+                params + [limit, start]
+            )
+            object_ids = [row[0] for row in cursor.fetchall()]
+
+        # d.object_id 是 SQLite 中保存的十六进制字符串，转回模型主键再查询
+        pk_field = self.queryset.model._meta.pk
+        object_ids = [pk_field.to_python(object_id) for object_id in object_ids]
+        instances = {instance.pk: instance for instance in self.queryset.filter(pk__in=object_ids)}
+        return [instances[object_id] for object_id in object_ids if object_id in instances]
+
+
+def search_users(query, queryset=None):
+    """
+    按用户名检索用户，返回支持 count() 和切片的结果
+
+    含 CJK 的查询走 n-gram 倒排表（按用户名排序），其他查询走 FTS5（按相关度排序）
+    """
+    queryset = User.objects.all() if queryset is None else queryset
+
+    if use_fts(query):
+        match = fts_query(query)
+        if match is None:
+            return queryset.none()
+        return RankedResults(queryset, FTS_TABLES[SearchDocument.USER], match)
+
+    if CJK_RUN_RE.search(query or ''):
+        results = ngram_search(SearchDocument.USER, query, queryset, 'name')
+        if results is not None:
+            return results
+    elif connection.vendor == 'postgresql':
+        return _postgres_search(queryset, 'name', query)
+
+    return queryset.filter(name__icontains=query).order_by('name')
+
+
+def search_posts(query, author_ids=(), queryset=None):
+    """
+    按正文检索帖子：公开帖子，以及 author_ids 中这些用户的私密帖子
+
+    返回支持 count() 和切片的结果；含 CJK 的查询走 n-gram 倒排表（按发布时间排序），其他查询走 FTS5（按相关度排序）
+    """
+    queryset = Post.objects.all() if queryset is None else queryset
+    author_ids = list(author_ids)
+
+    if use_fts(query):
+        match = fts_query(query)
+        if match is None:
+            return queryset.none()
+
+        table = FTS_TABLES[SearchDocument.POST]
+        where = 'AND (p.is_private = 0'
+        if author_ids:
+            where += ' OR p.created_by_id IN (%s)' % ', '.join(['%s'] * len(author_ids))
+        where += ')'
+
+        return RankedResults(
+            queryset,
+            table,
+            match,
+            joins='JOIN post_post p ON p.id = d.object_id',
+            where=where,
+            params=[User._meta.pk.get_db_prep_value(author_id, connection) for author_id in author_ids]
+        )
+
+    visible = queryset.filter(Q(is_private=False) | Q(created_by_id__in=author_ids))
+
+    if CJK_RUN_RE.search(query or ''):
+        results = ngram_search(SearchDocument.POST, query, visible, '-created_at')
+        if results is not None:
+            return results
+    elif connection.vendor == 'postgresql':
+        return _postgres_search(visible, 'body', query)
+
+    return visible.filter(body__icontains=query).order_by('-created_at')
+
+
+def _postgres_search(queryset, field, query):
+    # 与迁移中创建的 GIN 表达式索引使用相同的 to_tsvector('simple', 字段)
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    vector = SearchVector(field, config='simple')
+    search_query = SearchQuery(query, config='simple', search_type='websearch')
+
+    return (
+        queryset
+        .annotate(search_vector=vector, search_rank=SearchRank(vector, search_query))
+        .filter(search_vector=search_query)
+        .order_by('-search_rank')
+    )
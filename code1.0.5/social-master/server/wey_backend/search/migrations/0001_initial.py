@@ -0,0 +1,102 @@
+# Generated by Django 4.2 on 2026-10-17 19:52
+
+from bs4 import BeautifulSoup
+from django.db import migrations, models
+
+
+FTS_TABLES = {
+    'post': ('search_post_fts', 'post', 'Post', 'body'),
+    'user': ('search_user_fts', 'account', 'User', 'name'),
+}
+
+
+def _plain_text(text):
+    # 帖子正文可能是富文本HTML，只索引文字
+    if text and '<' in text and '>' in text:
+        return BeautifulSoup(text, 'html.parser').get_text(' ', strip=True)
+    return text or ''
+
+
+def _fts5_available(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE VIRTUAL TABLE temp.search_fts5_probe USING fts5(text)')
+            cursor.execute('DROP TABLE temp.search_fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def create_search_backend(apps, schema_editor):
+    """
+    SQLite 上为帖子正文和用户名各建一张 FTS5 表并写入现有数据；
+    PostgreSQL 上建 to_tsvector 表达式的 GIN 索引；其他数据库回退到 icontains，不需要额外的结构
+    """
+    connection = schema_editor.connection
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+
+        for table, app_label, model_name, field in FTS_TABLES.values():
+            model = apps.get_model(app_label, model_name)
+            schema_editor.add_index(model, GinIndex(SearchVector(field, config='simple'), name=f'{table}_idx'))
+        return
+
+    if connection.vendor != 'sqlite' or not _fts5_available(connection):
+        return
+
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+
+    for kind, (table, app_label, model_name, field) in FTS_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+        rows = list(apps.get_model(app_label, model_name).objects.values_list('pk', field))
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(kind=kind, object_id=pk) for pk, _ in rows],
+            batch_size=1000
+        )
+        document_ids = dict(SearchDocument.objects.filter(kind=kind).values_list('object_id', 'id'))
+
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, text) VALUES (%s, %s)',
+                [(document_ids[pk], _plain_text(text)) for pk, text in rows]
+            )
+
+
+def drop_search_backend(apps, schema_editor):
+    connection = schema_editor.connection
+
+    for table, app_label, model_name, _ in FTS_TABLES.values():
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_idx')
+        elif connection.vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('account', '0010_user_show_likes_to_others'),
+        ('post', '0022_postattachment_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('user', 'User')], max_length=10)),
+                ('object_id', models.UUIDField()),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
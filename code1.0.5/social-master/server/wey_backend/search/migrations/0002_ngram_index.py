@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+from post.utils import plain_text
+from search.ngrams import encode_postings, extract_terms, normalize
+
+
+# 索引必须和运行时使用同样的规范化和切分规则，这里直接复用 search.ngrams
+INDEXED_FIELDS = {
+    'post': ('post', 'Post', 'body'),
+    'user': ('account', 'User', 'name'),
+}
+
+
+def build_ngram_index(apps, schema_editor):
+    """为所有帖子和用户保存规范化文本，并一次性生成 n-gram 倒排表"""
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    SearchTerm = apps.get_model('search', 'SearchTerm')
+
+    for kind, (app_label, model_name, field) in INDEXED_FIELDS.items():
+        texts = {
+            pk: normalize(plain_text(value) if kind == 'post' else value)
+            for pk, value in apps.get_model(app_label, model_name).objects.values_list('pk', field).iterator()
+        }
+
+        # SQLite 上 0001 已经为每条记录建了 SearchDocument，其他数据库在这里补建
+        documents = {document.object_id: document for document in SearchDocument.objects.filter(kind=kind)}
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(kind=kind, object_id=pk, text=text) for pk, text in texts.items() if pk not in documents],
+            batch_size=1000
+        )
+        for pk, document in documents.items():
+            document.text = texts.get(pk, '')
+        SearchDocument.objects.bulk_update(documents.values(), ['text'], batch_size=1000)
+
+        postings = {}
+        for document_id, text in SearchDocument.objects.filter(kind=kind).values_list('id', 'text').iterator():
+            for term in extract_terms(text):
+                postings.setdefault(term, []).append(document_id)
+
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(kind=kind, term=term, df=len(document_ids), postings=encode_postings(document_ids))
+                for term, document_ids in postings.items()
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='text',
+            field=models.TextField(default=''),
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('user', 'User')], max_length=10)),
+                ('term', models.CharField(max_length=3)),
+                ('df', models.PositiveIntegerField(default=0)),
+                ('postings', models.BinaryField(default=bytes)),
+            ],
+            options={
+                'unique_together': {('kind', 'term')},
+            },
+        ),
+        migrations.RunPython(build_ngram_index, migrations.RunPython.noop),
+    ]
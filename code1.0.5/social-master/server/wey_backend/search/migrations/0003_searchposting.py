@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-17 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from search.ngrams import decode_postings, encode_postings
+
+
+def split_postings(apps, schema_editor):
+    """把每个词项一行的编码倒排表拆成每个（词项, 文档）一行"""
+    SearchTerm = apps.get_model('search', 'SearchTerm')
+    SearchPosting = apps.get_model('search', 'SearchPosting')
+
+    batch = []
+    for kind, term, postings in SearchTerm.objects.values_list('kind', 'term', 'postings').iterator():
+        batch.extend(
+            SearchPosting(kind=kind, term=term, document_id=document_id) for document_id in decode_postings(postings)
+        )
+        if len(batch) >= 1000:
+            SearchPosting.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    SearchPosting.objects.bulk_create(batch, batch_size=1000)
+
+
+def merge_postings(apps, schema_editor):
+    SearchTerm = apps.get_model('search', 'SearchTerm')
+    SearchPosting = apps.get_model('search', 'SearchPosting')
+
+    postings = {}
+    for kind, term, document_id in SearchPosting.objects.values_list('kind', 'term', 'document_id').iterator():
+        postings.setdefault((kind, term), []).append(document_id)
+
+    SearchTerm.objects.bulk_create(
+        [
+            SearchTerm(kind=kind, term=term, df=len(document_ids), postings=encode_postings(document_ids))
+            for (kind, term), document_ids in postings.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_ngram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('user', 'User')], max_length=10)),
+                ('term', models.CharField(max_length=3)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='search.searchdocument')),
+            ],
+            options={
+                'unique_together': {('kind', 'term', 'document')},
+            },
+        ),
+        migrations.RunPython(split_postings, merge_postings),
+        migrations.DeleteModel(
+            name='SearchTerm',
+        ),
+    ]
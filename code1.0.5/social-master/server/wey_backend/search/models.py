@@ -1,3 +1,39 @@
 from django.db import models
 
-# Create your models here.
+
+class SearchDocument(models.Model):
+    """
+    参与全文检索的一条记录（帖子正文或用户名）
+
+    自增的整数主键同时作为 FTS5 表的 rowid，更新和删除索引时直接按 rowid 定位
+    """
+    POST = 'post'
+    USER = 'user'
+
+    KIND_CHOICES = (
+        (POST, 'Post'),
+        (USER, 'User'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.UUIDField()
+    # 规范化后的纯文本，更新时据此计算 n-gram 的增减，查询时用来校验候选结果
+    text = models.TextField(default='')
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+
+class SearchPosting(models.Model):
+    """
+    CJK n-gram 倒排表：每个（二元/三元组, 文档）一行
+
+    新增和删除文档只插入、删除自己的行，不会和其他文档争用同一行；
+    (kind, term, document) 的唯一索引同时用于按词项取文档和按文档集合求交
+    """
+    kind = models.CharField(max_length=10, choices=SearchDocument.KIND_CHOICES)
+    term = models.CharField(max_length=3)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+
+    class Meta:
+        unique_together = ('kind', 'term', 'document')
@@ -0,0 +1,147 @@
+import re
+import unicodedata
+
+from django.db.models import Count
+
+from .models import SearchPosting
+
+
+# 汉字（含扩展 A 区）、日文假名和韩文音节，这些文字没有空格分词
+CJK_RUN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+')
+
+NGRAM_SIZES = (2, 3)
+
+# 一次批量读写的倒排项数量，避免单条 SQL 的参数过多
+TERM_BATCH_SIZE = 500
+
+# 候选不多于这么多时不再继续求交，剩下的交给文本校验，省去解码更长的倒排表
+CANDIDATE_LIMIT = 200
+
+
+def normalize(text):
+    """全角转半角并转小写，索引和查询使用同样的规范化"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def extract_terms(text):
+    """取出规范化文本中所有连续 CJK 片段的二元和三元组"""
+    terms = set()
+
+    for run in CJK_RUN_RE.findall(text):
+        for size in NGRAM_SIZES:
+            terms.update(run[i:i + size] for i in range(len(run) - size + 1))
+
+    return terms
+
+
+def query_terms(query):
+    """
+    查询用的 n-gram：长度不少于 3 的片段用三元组（更有区分度），长度为 2 的片段用二元组
+
+    单个汉字无法用索引缩小范围，返回空集合
+    """
+    terms = set()
+
+    for run in CJK_RUN_RE.findall(query):
+        size = 3 if len(run) >= 3 else 2
+        terms.update(run[i:i + size] for i in range(len(run) - size + 1))
+
+    return terms
+
+
+def encode_postings(document_ids):
+    """
+    把文档ID排序后按差值做 varint 编码，相邻ID的差通常只占一个字节
+
+    倒排表曾按词项整行保存这种编码，迁移 0002、0003 用它生成和转换旧的数据
+    """
+    output = bytearray()
+    previous = 0
+
+    for document_id in sorted(document_ids):
+        delta = document_id - previous
+        previous = document_id
+        while delta >= 0x80:
+            output.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        output.append(delta)
+
+    return bytes(output)
+
+
+def decode_postings(data):
+    document_ids = []
+    value = shift = previous = 0
+
+    for byte in bytes(data):
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        document_ids.append(previous)
+        value = shift = 0
+
+    return document_ids
+
+
+def batches(items, size=TERM_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def update_postings(kind, document_id, old_terms, new_terms):
+    """
+    增量更新倒排表：删除文档不再包含的词项行，插入新出现的词项行
+
+    只读写这个文档自己的行，常见词项也不会成为并发更新的热点；调用方负责放在事务中
+    """
+    removed = old_terms - new_terms
+    added = new_terms - old_terms
+
+    for batch in batches(sorted(removed)):
+        SearchPosting.objects.filter(kind=kind, term__in=batch, document_id=document_id).delete()
+
+    SearchPosting.objects.bulk_create(
+        [SearchPosting(kind=kind, term=term, document_id=document_id) for term in sorted(added)],
+        batch_size=TERM_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def build_postings(kind, documents):
+    """按 [(文档ID, 规范化文本)] 生成这些文档的全部倒排行，用于重建索引"""
+    return [
+        SearchPosting(kind=kind, term=term, document_id=document_id)
+        for document_id, text in documents
+        for term in extract_terms(text)
+    ]
+
+
+def candidate_documents(kind, terms):
+    """
+    对查询的各个 n-gram 的倒排行求交集，返回可能包含查询串的文档ID
+
+    先按词项统计文档数，从最少的开始，之后每个词项只按已有的候选在唯一索引上查找；
+    交集为空或已经足够小时提前结束，候选之后还会校验文本。某个 n-gram 不在索引中说明没有匹配
+    """
+    postings = SearchPosting.objects.filter(kind=kind)
+    df = dict(
+        postings.filter(term__in=terms).values('term').annotate(df=Count('id')).order_by().values_list('term', 'df')
+    )
+    if len(df) < len(terms):
+        return set()
+
+    ordered = sorted(terms, key=lambda term: (df[term], term))
+    candidates = set(postings.filter(term=ordered[0]).values_list('document_id', flat=True))
+
+    for term in ordered[1:]:
+        if len(candidates) <= CANDIDATE_LIMIT:
+            break
+        matched = set()
+        for batch in batches(sorted(candidates)):
+            matched.update(postings.filter(term=term, document_id__in=batch).values_list('document_id', flat=True))
+        candidates = matched
+
+    return candidates
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from account.models import User
+from post.models import Post
+
+from .index import remove_document, update_document
+from .models import SearchDocument
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """帖子新建或修改正文后更新检索索引"""
+    if update_fields is None or 'body' in update_fields:
+        update_document(SearchDocument.POST, instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    remove_document(SearchDocument.POST, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    """用户注册或修改用户名后更新检索索引"""
+    if update_fields is None or 'name' in update_fields:
+        update_document(SearchDocument.USER, instance)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    remove_document(SearchDocument.USER, instance.pk)
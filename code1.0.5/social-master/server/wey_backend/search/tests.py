@@ -1,3 +1,150 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.models import User
+from post.models import Post
+
+from .index import fts_query, rebuild_index, search_posts, search_users
+from .models import SearchDocument, SearchPosting
+from .ngrams import candidate_documents, decode_postings, encode_postings, extract_terms, normalize, query_terms
+
+
+class NgramSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(name='searcher', email='searcher@example.com', password='password')
+        self.matches = [Post.objects.create(body=f'今天天气很好 {index}', created_by=self.user) for index in range(3)]
+        # 两个三元组都在，但不包含整个查询串，只是候选
+        Post.objects.create(body='天气很冷，气很好', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_results_are_verified_and_ordered(self):
+        posts = search_posts('天气很好')
+
+        self.assertEqual(list(posts[0:10]), self.matches[::-1])
+        self.assertEqual(posts.count(), 3)
+
+    def test_count_does_not_verify_unsliced_candidates(self):
+        posts = search_posts('天气很好')
+
+        with self.assertNumQueries(2):
+            self.assertEqual(posts.count(), 4)
+        self.assertEqual(len(posts[0:1]), 1)
+
+    def test_search_endpoint_reports_more_pages(self):
+        response = self.client.post('/api/search/', {'query': '天气很好', 'page_size': 2}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['posts']), 2)
+        self.assertTrue(data['posts_has_more'])
+        self.assertFalse(data['users_has_more'])
+
+        response = self.client.post('/api/search/', {'query': '天气很好', 'page': 2, 'page_size': 2}, format='json')
+        self.assertEqual(len(response.json()['posts']), 1)
+        self.assertFalse(response.json()['posts_has_more'])
+
+
+class PostingMaintenanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(name='author', email='author@example.com', password='password')
+
+    def postings(self, post):
+        document = SearchDocument.objects.get(kind=SearchDocument.POST, object_id=post.pk)
+        return set(SearchPosting.objects.filter(document=document).values_list('term', flat=True))
+
+    def test_edit_only_touches_changed_terms(self):
+        post = Post.objects.create(body='今天天气', created_by=self.user)
+        self.assertEqual(self.postings(post), extract_terms('今天天气'))
+
+        post.body = '今天下雨'
+        post.save()
+        self.assertEqual(self.postings(post), extract_terms('今天下雨'))
+
+    def test_delete_removes_postings(self):
+        post = Post.objects.create(body='今天天气', created_by=self.user)
+        post.delete()
+
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_candidates_intersect_terms(self):
+        first = Post.objects.create(body='天气很好', created_by=self.user)
+        Post.objects.create(body='天气很冷', created_by=self.user)
+        document = SearchDocument.objects.get(kind=SearchDocument.POST, object_id=first.pk)
+
+        self.assertEqual(candidate_documents(SearchDocument.POST, {'天气很', '气很好'}), {document.pk})
+        self.assertEqual(candidate_documents(SearchDocument.POST, {'天气很', '下雨天'}), set())
+
+    def test_rebuild_matches_incremental_index(self):
+        for body in ('今天天气很好', '明天天气', '<p>天气</p>'):
+            Post.objects.create(body=body, created_by=self.user)
+        incremental = set(SearchPosting.objects.values_list('kind', 'term', 'document__object_id'))
+
+        self.assertEqual(rebuild_index(batch_size=2), Post.objects.count() + User.objects.count())
+        self.assertEqual(set(SearchPosting.objects.values_list('kind', 'term', 'document__object_id')), incremental)
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(name='Ｓｅａｒｃｈｅｒ', email='searcher@example.com', password='password')
+
+    def test_fts_query(self):
+        self.assertEqual(fts_query('hello world'), '"hello" "world"*')
+        self.assertEqual(fts_query('ＨＥＬＬＯ Wo"rld'), '"hello" "wo" "rld"*')
+        self.assertIsNone(fts_query(' ,. '))
+
+    def test_full_width_query_matches(self):
+        post = Post.objects.create(body='<p>Django release notes</p>', created_by=self.user)
+
+        self.assertEqual(list(search_posts('ＤＪＡＮＧＯ rel')[0:10]), [post])
+        self.assertEqual(list(search_users('searcher')[0:10]), [self.user])
+        self.assertEqual(search_posts('flask').count(), 0)
+
+    def test_private_posts_are_limited_to_authors(self):
+        post = Post.objects.create(body='secret plans', created_by=self.user, is_private=True)
+
+        self.assertEqual(search_posts('secret').count(), 0)
+        self.assertEqual(list(search_posts('secret', author_ids=[self.user.pk])[0:10]), [post])
+
+
+class PostingsEncodingTests(SimpleTestCase):
+    # 迁移 0002、0003 用这套编码生成和转换按词项整行保存的旧倒排表
+    def test_round_trip(self):
+        for document_ids in ([], [1], [1, 2, 3], [5, 127, 128, 300, 16384, 2 ** 40]):
+            with self.subTest(document_ids=document_ids):
+                self.assertEqual(decode_postings(encode_postings(document_ids)), document_ids)
+
+    def test_sorts_before_encoding(self):
+        self.assertEqual(decode_postings(encode_postings({300, 1, 128})), [1, 128, 300])
+
+    def test_small_gaps_take_one_byte(self):
+        self.assertEqual(encode_postings([1, 2, 3]), b'\x01\x01\x01')
+        self.assertEqual(encode_postings([128]), b'\x80\x01')
+
+    def test_decodes_memoryview(self):
+        # 数据库的 BinaryField 可能返回 memoryview
+        self.assertEqual(decode_postings(memoryview(encode_postings([7, 9]))), [7, 9])
+
+
+class TermTests(SimpleTestCase):
+    def test_extract_terms(self):
+        self.assertEqual(extract_terms('今天天气'), {'今天', '天天', '天气', '今天天', '天天气'})
+        self.assertEqual(extract_terms('中文 hello 你好'), {'中文', '你好'})
+        self.assertEqual(extract_terms('单'), set())
+        self.assertEqual(extract_terms('hello world'), set())
+
+    def test_runs_do_not_cross_punctuation(self):
+        self.assertEqual(extract_terms('你好，世界'), {'你好', '世界'})
+
+    def test_kana_and_hangul(self):
+        self.assertEqual(extract_terms('ひらがな'), {'ひら', 'らが', 'がな', 'ひらが', 'らがな'})
+        self.assertEqual(extract_terms('한국어'), {'한국', '국어', '한국어'})
+
+    def test_normalize(self):
+        self.assertEqual(normalize('ＡＢＣ１２３'), 'abc123')
+        self.assertEqual(normalize(None), '')
+
+    def test_query_terms(self):
+        self.assertEqual(query_terms('天气很好'), {'天气很', '气很好'})
+        self.assertEqual(query_terms('天气'), {'天气'})
+        self.assertEqual(query_terms('天'), set())
@@ -7,7 +7,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
 from rest_framework import status
 
-from post.models import Post, Comment, Like, Trend, PostReport
+from post.models import Post, Comment, CommentLike, PostLike, Trend, PostReport
 from account.models import User, FriendshipRequest, MibtTestResult
 from .models import VisualizationLog
 from .views import log_visualization_access
@@ -40,8 +40,12 @@ def admin_dashboard(request):
     new_posts_30d = Post.objects.filter(created_at__gte=thirty_days_ago).count()
     
     # 总点赞数和最近30天新增点赞数
-    total_likes = Like.objects.count()
-    new_likes_30d = Like.objects.filter(created_at__gte=thirty_days_ago).count()
+    # 点赞数包含帖子点赞和评论点赞
+    total_likes = PostLike.objects.count() + CommentLike.objects.count()
+    new_likes_30d = (
+        PostLike.objects.filter(created_at__gte=thirty_days_ago).count() +
+        CommentLike.objects.filter(created_at__gte=thirty_days_ago).count()
+    )
     
     # 总评论数和最近30天新增评论数
     total_comments = Comment.objects.count()
@@ -60,7 +64,8 @@ def admin_dashboard(request):
     active_user_ids = set()
     active_user_ids.update(Post.objects.filter(created_at__gte=thirty_days_ago).values_list('created_by', flat=True))
     active_user_ids.update(Comment.objects.filter(created_at__gte=thirty_days_ago).values_list('created_by', flat=True))
-    active_user_ids.update(Like.objects.filter(created_at__gte=thirty_days_ago).values_list('created_by', flat=True))
+    active_user_ids.update(PostLike.objects.filter(created_at__gte=thirty_days_ago).values_list('created_by', flat=True))
+    active_user_ids.update(CommentLike.objects.filter(created_at__gte=thirty_days_ago).values_list('created_by', flat=True))
     active_users_30d = len(active_user_ids)
     
     # 用户活跃率
@@ -78,7 +83,10 @@ def admin_dashboard(request):
         
         new_users = User.objects.filter(date_joined__range=(start_date, end_date)).count()
         new_posts = Post.objects.filter(created_at__range=(start_date, end_date)).count()
-        new_likes = Like.objects.filter(created_at__range=(start_date, end_date)).count()
+        new_likes = (
+            PostLike.objects.filter(created_at__range=(start_date, end_date)).count() +
+            CommentLike.objects.filter(created_at__range=(start_date, end_date)).count()
+        )
         new_comments = Comment.objects.filter(created_at__range=(start_date, end_date)).count()
         
         weeks.append({
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import VisualizationLog
-from post.models import Post, Comment, Like, Trend
+from post.models import Post, Comment, Trend
 from account.models import User, FriendshipRequest
 
 class VisualizationLogSerializer(serializers.ModelSerializer):
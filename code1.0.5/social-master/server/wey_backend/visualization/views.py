@@ -6,7 +6,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
 
-from post.models import Post, Comment, Like, Trend
+from post.models import Post, Comment, CommentLike, PostLike, Trend
 from account.models import User, FriendshipRequest, MibtTestResult
 from .models import VisualizationLog
 from rest_framework.permissions import BasePermission
@@ -104,12 +104,18 @@ def interaction_statistics(request):
     """用户互动统计数据可视化"""
     log_visualization_access('interaction_statistics', request)
     
-    # 按月份统计点赞数量
-    likes_by_month = Like.objects.annotate(
-        month=TruncMonth('created_at')
-    ).values('month').annotate(
-        count=Count('id')
-    ).order_by('month')
+    # 按月份统计点赞数量（帖子点赞和评论点赞合并）
+    like_counts = {}
+    for model in (PostLike, CommentLike):
+        rows = model.objects.annotate(
+            month=TruncMonth('created_at')
+        ).values('month').annotate(
+            count=Count('id')
+        ).values_list('month', 'count')
+        for month, count in rows:
+            like_counts[month] = like_counts.get(month, 0) + count
+
+    likes_by_month = [{'month': month, 'count': like_counts[month]} for month in sorted(like_counts)]
     
     # 按月份统计评论数量
     comments_by_month = Comment.objects.annotate(
@@ -137,7 +143,7 @@ def interaction_statistics(request):
         'comments_by_month': list(comments_by_month),
         'friend_requests_by_month': list(friend_requests_by_month),
         'friendship_status': list(friendship_status),
-        'total_likes': Like.objects.count(),
+        'total_likes': PostLike.objects.count() + CommentLike.objects.count(),
         'total_comments': Comment.objects.count()
     })
 
@@ -165,7 +171,7 @@ def user_activity_summary(request):
     comments_made = Comment.objects.filter(created_by=user).count()
     
     # 用户发出的点赞数量
-    likes_given = Like.objects.filter(created_by=user).count()
+    likes_given = user.post_likes.count() + user.comment_likes.count()
     
     # 用户的好友数量
     friends_count = user.friends_count
@@ -0,0 +1,218 @@
+import io
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from post.conditional import fingerprint
+
+
+# 自上次清理以来写入缓存的字节数，超过上限的十分之一时扫描一次缓存目录
+WRITTEN_SINCE_EVICTION_KEY = 'resized_media_written'
+
+# 命中缓存时最多每隔这么久更新一次文件的修改时间，作为 LRU 的最近使用时间
+TOUCH_INTERVAL = 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def resized_media_url(name, width, height):
+    """缩放后图片的完整地址；尺寸不在 MEDIA_RESIZE_SIZES 中时返回原图地址"""
+    media_url = settings.WEBSITE_URL + '/' + settings.MEDIA_URL.strip('/')
+
+    if (width, height) not in settings.MEDIA_RESIZE_SIZES:
+        return f'{media_url}/{name}'
+    return f'{media_url}/resized/{width}x{height}/{name}'
+
+
+def _media_path(path):
+    """
+    校验请求的路径并返回相对 MEDIA_ROOT 的规范化路径
+
+    含 .. 、. 或空段的路径以及绝对路径一律 404，原图和缓存文件都只能落在各自的目录内
+    """
+    parts = path.replace('\\', '/').split('/')
+    if path.startswith('/') or any(part in ('', '.', '..') for part in parts):
+        raise Http404
+
+    try:
+        source_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    return os.path.relpath(source_path, os.path.abspath(settings.MEDIA_ROOT))
+
+
+def _source_path(path):
+    return os.path.join(os.path.abspath(settings.MEDIA_ROOT), _media_path(path))
+
+
+def _cache_path(width, height, path):
+    extension = settings.POST_IMAGE_FORMAT.lower()
+    try:
+        return safe_join(settings.MEDIA_RESIZE_CACHE_DIR, f'{width}x{height}', f'{_media_path(path)}.{extension}')
+    except SuspiciousFileOperation:
+        raise Http404
+
+
+def render_resized(source_path, width, height):
+    """按拍摄方向转正后等比缩放到 width x height 以内（不放大），返回编码后的字节"""
+    with Image.open(source_path) as original:
+        # JPEG 可以在解码时直接按比例缩小，省去大部分解码开销
+        original.draft('RGB', (width, height))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    image.thumbnail((width, height), Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format=settings.POST_IMAGE_FORMAT, quality=settings.POST_IMAGE_QUALITY)
+    return output.getvalue()
+
+
+def evict_resized_cache(max_size=None):
+    """按最近使用时间（文件修改时间）从旧到新删除缓存文件，直到总大小不超过上限，返回删除的文件数"""
+    max_size = settings.MEDIA_RESIZE_CACHE_MAX_SIZE if max_size is None else max_size
+    entries = []
+    total = 0
+
+    for root, _, files in os.walk(settings.MEDIA_RESIZE_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+
+    return evicted
+
+
+def _write_cache(cache_path, data):
+    # 先写临时文件再改名，并发请求不会读到写了一半的文件
+    directory = os.path.dirname(cache_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, cache_path)
+
+    cache.add(WRITTEN_SINCE_EVICTION_KEY, 0, None)
+    if cache.incr(WRITTEN_SINCE_EVICTION_KEY, len(data)) > settings.MEDIA_RESIZE_CACHE_MAX_SIZE // 10:
+        cache.set(WRITTEN_SINCE_EVICTION_KEY, 0, None)
+        evict_resized_cache()
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as cached:
+            data = cached.read()
+            mtime = os.fstat(cached.fileno()).st_mtime
+    except FileNotFoundError:
+        return None
+
+    # 更新修改时间，标记为最近使用
+    if time.time() - mtime > TOUCH_INTERVAL:
+        try:
+            os.utime(cache_path)
+        except FileNotFoundError:
+            pass
+    return data
+
+
+def _ranged_response(request, data, content_type, etag):
+    """支持单个 bytes 区间的 Range 请求；If-Range 与当前 ETag 不一致时返回完整内容"""
+    range_header = request.headers.get('Range', '')
+    match = RANGE_RE.match(range_header.strip())
+    if_range = request.headers.get('If-Range')
+
+    if not match or (if_range and if_range.strip('"') != etag) or match.groups() == ('', ''):
+        response = HttpResponse(data, content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    size = len(data)
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+
+    if start > end or start >= size:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    response = HttpResponse(data[start:end + 1], content_type=content_type, status=206)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _resized_etag(request, width, height, path):
+    # 缩放结果只取决于原图和输出参数，用原图的大小和修改时间即可判断，不需要先生成图片
+    try:
+        stat = os.stat(_source_path(path))
+    except (OSError, Http404):
+        return None
+    return fingerprint(width, height, path, stat.st_size, stat.st_mtime_ns,
+                       settings.POST_IMAGE_FORMAT, settings.POST_IMAGE_QUALITY)
+
+
+@require_safe
+@condition(etag_func=_resized_etag)
+def resized_media(request, width, height, path):
+    """
+    /media/resized/<宽>x<高>/<路径>：返回缩放后的头像或帖子图片
+
+    第一次请求时用 Pillow 生成并写入磁盘缓存（MEDIA_RESIZE_CACHE_DIR），之后直接读取缓存；
+    缓存总大小超过 MEDIA_RESIZE_CACHE_MAX_SIZE 时按最近使用时间淘汰。
+    只接受 MEDIA_RESIZE_SIZES 中的尺寸，避免任意尺寸把缓存撑满
+    """
+    if (width, height) not in settings.MEDIA_RESIZE_SIZES:
+        raise Http404
+
+    source_path = _source_path(path)
+    if not os.path.isfile(source_path):
+        raise Http404
+
+    cache_path = _cache_path(width, height, path)
+    data = _read_cache(cache_path)
+
+    if data is None:
+        try:
+            data = render_resized(source_path, width, height)
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            # 不是图片，或像素数超过 Image.MAX_IMAGE_PIXELS 的两倍，Pillow 拒绝解码
+            return HttpResponse(status=415)
+        except OSError:
+            raise Http404
+        _write_cache(cache_path, data)
+
+    etag = _resized_etag(request, width, height, path)
+    response = _ranged_response(request, data, f'image/{settings.POST_IMAGE_FORMAT.lower()}', etag)
+
+    # 原图按内容哈希命名，同一地址的内容不会变化，可以长期缓存
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_RESIZE_CACHE_MAX_AGE, immutable=True)
+    return response
@@ -150,3 +150,80 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# 首页动态分页
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 50
+
+# 是否使用写扩散的时间线表生成首页动态（开启前先运行 scripts/rebuild_timelines.py）
+# 扩散依赖好友ID列表，只有配置了多进程共享的缓存（Redis、Memcached 等）时才会缓存，否则每次查询数据库
+FEED_USE_TIMELINE = False
+
+# 首页热度排序（?mode=ranked）：候选时间窗口、候选数量上限、作者亲密度权重
+FEED_RANKED_WINDOW_DAYS = 7
+FEED_RANKED_MAX_CANDIDATES = 500
+FEED_RANKED_AFFINITY_WEIGHT = 0.5
+
+# 点赞数写回缓冲：点赞增量先累加在缓存中，由 scripts/flush_like_counters.py 定期批量写回
+# 需要配置多进程共享的缓存（Redis、Memcached 等），默认的进程内缓存下开启也不生效，仍直接更新数据库
+LIKE_WRITE_BEHIND = False
+LIKE_WRITE_BEHIND_BATCH_SIZE = 500
+
+# 帖子详情中预览的评论条数（可用 ?comments= 调整），更多评论通过 /api/posts/<id>/comments/ 分页加载
+POST_DETAIL_PREVIEW_COMMENTS = 20
+
+# /api/posts/state/ 单次请求最多刷新的帖子ID和评论ID数量（各自计算）
+POST_STATE_MAX_IDS = 300
+
+# /api/posts/batch/ 单次请求最多获取的帖子数量
+POST_BATCH_MAX_IDS = 100
+
+# 帖子图片后台处理：生成的尺寸 {名称: 最长边像素}、输出格式和质量、进程池大小（0 表示在请求进程内同步处理）
+POST_IMAGE_VARIANTS = {
+    'thumb': 320,
+    'feed': 1080,
+    'full': 2048,
+}
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+IMAGE_PROCESSING_WORKERS = 2
+
+# 上传文件按内容寻址存储：内容相同的文件只保存一份，上传时边接收边计算哈希
+STORAGES = {
+    'default': {
+        'BACKEND': 'wey_backend.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# 上传按块写入临时文件
+FILE_UPLOAD_HANDLERS = [
+    'wey_backend.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# 上传图片的接口（wey_backend.uploads.limit_uploads）在数据流入时检查数量、大小和图片文件头：
+# 单个请求的文件数量、单个文件大小、所有文件合计大小（字节）
+UPLOAD_MAX_FILES = 9
+UPLOAD_MAX_FILE_SIZE = 10 * 1024 * 1024
+UPLOAD_MAX_TOTAL_SIZE = 40 * 1024 * 1024
+
+# /media/resized/<宽>x<高>/<路径> 按需缩放图片：允许的尺寸、磁盘缓存目录和总大小上限（字节）、浏览器缓存时间（秒）
+MEDIA_RESIZE_SIZES = [
+    (48, 48),
+    (96, 96),
+    (200, 200),
+    (320, 320),
+    (640, 640),
+    (1080, 1080),
+]
+MEDIA_RESIZE_CACHE_DIR = BASE_DIR / 'media_cache'
+MEDIA_RESIZE_CACHE_MAX_SIZE = 512 * 1024 * 1024
+MEDIA_RESIZE_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# User.get_avatar 和 PostAttachment.get_image 返回的缩放尺寸，需要在 MEDIA_RESIZE_SIZES 中
+AVATAR_IMAGE_SIZE = (200, 200)
+POST_IMAGE_DISPLAY_SIZE = (1080, 1080)
+
+# /api/search/ 每页返回的用户和帖子数量（请求体中的 page_size 可以覆盖）
+SEARCH_PAGE_SIZE = 20
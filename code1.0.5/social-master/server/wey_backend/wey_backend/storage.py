@@ -0,0 +1,179 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.apps import apps
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models
+
+
+# 刚被复用的文件在这段时间内不删除：引用它的记录可能还在未提交的事务中，检查不到
+RELEASE_GRACE_PERIOD = 10 * 60
+
+# 宽限期内推迟释放的文件名记录在所在分片目录的这个文件中，由 sweep_deferred_releases 过期后重新检查
+DEFERRED_RELEASES_NAME = '.deferred'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    按内容的 SHA-256 命名文件：<上传目录>/<哈希前两位>/<哈希>.<扩展名>
+
+    内容相同的上传只保存一份，后保存的记录直接引用已有的文件；
+    删除文件前需要用 release_file 确认已经没有记录引用它
+    """
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+
+        with self.lock(name):
+            if self.exists(name):
+                # 刷新修改时间，release_file 在宽限期内不会删除刚被复用的文件
+                os.utime(self.path(name))
+                return name
+
+            name = super()._save(name, content)
+
+            # 新文件不可能被并发释放（释放的前提是已有记录引用它），把修改时间回拨到宽限期之前，只有复用才进入宽限期
+            expired = time.time() - RELEASE_GRACE_PERIOD
+            os.utime(self.path(name), (expired, expired))
+            return name
+
+    @contextmanager
+    def lock(self, name):
+        """按文件所在的哈希分片目录加文件锁，保存时复用文件与 release_file 的检查和删除互斥"""
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, '.lock'), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def hashed_name(self, name, content):
+        content_hash = getattr(content, 'content_hash', None)
+
+        if content_hash is None:
+            hasher = hashlib.sha256()
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                hasher.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            content_hash = hasher.hexdigest()
+
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, content_hash[:2], content_hash + extension).replace('\\', '/')
+
+
+def _file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def is_file_referenced(name):
+    """
+    检查是否还有任何模型的文件字段引用这个文件
+
+    每个文件字段一次按值的查询，文件字段都建了索引（User.avatar、PostAttachment.image），新增文件字段时也要加索引
+    """
+    return any(
+        model._default_manager.filter(**{field.name: name}).exists()
+        for model, field in _file_fields()
+    )
+
+
+def _recently_reused(storage, name):
+    if not isinstance(storage, ContentAddressedStorage):
+        return False
+
+    try:
+        return time.time() - os.path.getmtime(storage.path(name)) < RELEASE_GRACE_PERIOD
+    except OSError:
+        return False
+
+
+def _lock(storage, name):
+    return storage.lock(name) if isinstance(storage, ContentAddressedStorage) else nullcontext()
+
+
+def _deferred_path(storage, name):
+    return os.path.join(os.path.dirname(storage.path(name)), DEFERRED_RELEASES_NAME)
+
+
+def _defer_release(storage, name):
+    # 调用方已持有分片目录的锁
+    with open(_deferred_path(storage, name), 'a', encoding='utf-8') as deferred:
+        deferred.write(name + '\n')
+
+
+def _release_locked(storage, name):
+    """在分片目录的锁内检查并删除，返回 True（已删除）、False（仍被引用）或 None（宽限期内，需推迟）"""
+    if is_file_referenced(name):
+        return False
+    if _recently_reused(storage, name):
+        return None
+
+    storage.delete(name)
+    return True
+
+
+def release_file(name, storage=None):
+    """
+    记录不再引用某个文件时调用：没有其他记录引用时才真正删除
+
+    检查和删除在文件锁内进行；宽限期内被复用过的文件先保留（新的引用可能还没有提交），
+    记入推迟列表，由 scripts/sweep_deferred_media.py 过期后重新检查
+    """
+    storage = storage or default_storage
+    if not name:
+        return False
+
+    with _lock(storage, name):
+        released = _release_locked(storage, name)
+        if released is None:
+            _defer_release(storage, name)
+
+    return bool(released)
+
+
+def sweep_deferred_releases(storage=None):
+    """重新检查所有推迟释放的文件，宽限期已过且没有引用的删除，返回删除的文件数"""
+    storage = storage or default_storage
+    if not isinstance(storage, ContentAddressedStorage):
+        return 0
+
+    released = 0
+    for root, _, files in os.walk(storage.location):
+        if DEFERRED_RELEASES_NAME not in files:
+            continue
+
+        path = os.path.join(root, DEFERRED_RELEASES_NAME)
+        with storage.lock(os.path.relpath(path, storage.location)):
+            with open(path, encoding='utf-8') as deferred:
+                names = set(filter(None, deferred.read().splitlines()))
+
+            pending = []
+            for name in sorted(names):
+                if not storage.exists(name):
+                    continue
+                result = _release_locked(storage, name)
+                if result is None:
+                    pending.append(name)
+                released += bool(result)
+
+            if pending:
+                with open(path, 'w', encoding='utf-8') as deferred:
+                    deferred.write(''.join(name + '\n' for name in pending))
+            else:
+                os.remove(path)
+
+    return released
+
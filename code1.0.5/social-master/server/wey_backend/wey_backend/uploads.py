@@ -0,0 +1,126 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+from django.http import JsonResponse
+from django.http.multipartparser import MultiPartParserError
+from rest_framework.exceptions import ParseError
+
+
+# 允许上传的图片格式的文件头：(偏移, 魔数)
+IMAGE_SIGNATURES = (
+    (0, b'\xff\xd8\xff'),  # JPEG
+    (0, b'\x89PNG\r\n\x1a\n'),  # PNG
+    (0, b'GIF87a'),
+    (0, b'GIF89a'),
+    (8, b'WEBP'),  # RIFF....WEBP
+)
+
+
+class UploadRejected(MultiPartParserError):
+    """上传超出限制或不是图片，解析请求时抛出，由 limit_uploads 转为 400 响应"""
+
+
+def is_image_header(data):
+    return any(data[offset:offset + len(signature)] == signature for offset, signature in IMAGE_SIGNATURES)
+
+
+def _megabytes(size):
+    return f'{size / (1024 * 1024):g} MB'
+
+
+class UploadLimitHandler(FileUploadHandler):
+    """
+    由 limit_uploads 排在上传处理器的最前面，在数据流入时检查限制：
+
+    - 文件数量不超过 UPLOAD_MAX_FILES
+    - 单个文件不超过 UPLOAD_MAX_FILE_SIZE，所有文件合计不超过 UPLOAD_MAX_TOTAL_SIZE
+    - 第一块数据的文件头必须是允许的图片格式
+
+    超出限制时立即停止解析，不再读取剩下的请求体，也不会创建帖子
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_size = content_length or 0
+        self.files_count = 0
+        self.total_size = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+
+        # 请求体本身已经超过合计上限时，不必等到读完文件再拒绝
+        if self.request_size > settings.UPLOAD_MAX_TOTAL_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise UploadRejected(f'上传的文件合计不能超过 {_megabytes(settings.UPLOAD_MAX_TOTAL_SIZE)}')
+
+        self.files_count += 1
+        if self.files_count > settings.UPLOAD_MAX_FILES:
+            raise UploadRejected(f'一次最多上传 {settings.UPLOAD_MAX_FILES} 个文件')
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and not is_image_header(raw_data):
+            raise UploadRejected(f'{self.file_name} 不是支持的图片格式')
+
+        self.total_size += len(raw_data)
+
+        if start + len(raw_data) > settings.UPLOAD_MAX_FILE_SIZE:
+            raise UploadRejected(f'单个文件不能超过 {_megabytes(settings.UPLOAD_MAX_FILE_SIZE)}')
+        if self.total_size > settings.UPLOAD_MAX_TOTAL_SIZE:
+            raise UploadRejected(f'上传的文件合计不能超过 {_megabytes(settings.UPLOAD_MAX_TOTAL_SIZE)}')
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        if file_size == 0:
+            raise UploadRejected(f'{self.file_name} 是空文件')
+        return None
+
+
+def limit_uploads(view):
+    """
+    为上传图片的 DRF 接口（写在 @api_view 之下）加上 UploadLimitHandler
+
+    只作用于这些接口，Django admin 等其他表单不受图片限制；在进入视图前解析请求体，
+    超出限制时返回 {'error': 原因} 和 400，与其他接口的错误格式一致
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        request.upload_handlers.insert(0, UploadLimitHandler(request))
+
+        try:
+            request.data
+        except ParseError as e:
+            # DRF 把解析时的异常包装为 ParseError，原始异常在 __context__ 上
+            if isinstance(e.__context__, UploadRejected):
+                return JsonResponse({'error': str(e.__context__)}, status=400)
+            raise
+
+        return view(request, *args, **kwargs)
+
+    return inner
+
+
+class HashingUploadMixin:
+    """
+    在上传数据流入的同时计算 SHA-256，完成后记录在文件对象的 content_hash 上
+
+    ContentAddressedStorage 保存时直接使用这个值，不必再把文件读一遍
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """按块写入临时文件，无论文件多大，每个请求只在内存中保留一块数据"""
@@ -7,6 +7,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
 from account.views import activateemail
+from wey_backend.resize import resized_media
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -29,6 +30,8 @@ urlpatterns = [
     path('api/notifications/', include('notification.urls')),
     path('api/visualization/', include('visualization.urls')),
     path('activateemail/', activateemail, name='activateemail'),
+    # 按需缩放的头像和帖子图片，需要排在 MEDIA_URL 的静态文件路由之前
+    path(f'{settings.MEDIA_URL.lstrip("/")}resized/<int:width>x<int:height>/<path:path>', resized_media, name='resized_media'),
     path('admin/', admin.site.urls),
     # Swagger URLs
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),